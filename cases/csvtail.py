@@ -0,0 +1,307 @@
+import argparse
+import fcntl
+import io
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+# how much of the start of a csv is kept to recognise when it has been
+# replaced, as a fresh file can reuse the old one's inode
+HEAD_BYTES = 256
+
+
+class CSVTail:
+    # follows a csv written by a pyfr plugin (force.csv, integral.csv, a
+    # sampler's probes) and parses only the rows appended since the last
+    # call into numpy columns. the parsed rows are appended to a raw binary
+    # sidecar, {csv}.cols/, beside the file, so a later reader, whether the
+    # next analysis or another process, loads what has been parsed so far
+    # straight from there and only parses the rows written since
+    def __init__(self, filename: str, sidecar: bool = True, dtype=np.float64):
+        self.filename = filename
+        self.dtype = np.dtype(dtype)
+        self.sidecar = sidecar_dir(filename) if sidecar else None
+
+        self._reset()
+
+    def _reset(self):
+        self.offset = 0
+        self.columns = None
+        self.head = b""
+        self._header = b""
+        self._chunks = []
+        self._data = None
+        self._nrows = 0
+
+    def __len__(self) -> int:
+        return self._nrows
+
+    def __contains__(self, name: str) -> bool:
+        return self.columns is not None and name in self.columns
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if self.columns is None:
+            raise KeyError(name)
+
+        if self._data is None:
+            if self._chunks:
+                data = np.concatenate(self._chunks)
+            else:
+                data = np.empty((0, len(self.columns)), dtype=self.dtype)
+            self._chunks = [data]
+            self._data = data
+
+        return self._data[:, self.columns.index(name)]
+
+    def between(self, t_start: float, t_end: float, tcol: str = "t") -> np.ndarray:
+        # a mask of the rows with t_start <= t <= t_end
+        t = self[tcol]
+        return (t >= t_start) & (t <= t_end)
+
+    def update(self) -> int:
+        # parses any complete rows written since the last call, returning
+        # how many there were
+        if not os.path.exists(self.filename):
+            if self._nrows:
+                self._reset()
+            return 0
+
+        if self._replaced():
+            self._reset()
+
+        if self.sidecar is None:
+            return self._parse()
+
+        try:
+            os.makedirs(self.sidecar, exist_ok=True)
+            lock = open(os.path.join(self.sidecar, ".lock"), "w")
+        except OSError:
+            # a read-only results directory: parse without keeping anything
+            self.sidecar = None
+            return self._parse()
+
+        with lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            new = self._load() + self._parse()
+            self._save()
+            return new
+
+    def _replaced(self) -> bool:
+        # whether the file is no longer the one the parsed rows came from
+        size = os.path.getsize(self.filename)
+        if size < self.offset:
+            return True
+        if not self.head:
+            return False
+
+        with open(self.filename, "rb") as f:
+            return f.read(len(self.head)) != self.head
+
+    def _parse(self) -> int:
+        with open(self.filename, "rb") as f:
+            f.seek(self.offset)
+            chunk = f.read()
+
+        # leave a half-written last line for next time
+        end = chunk.rfind(b"\n") + 1
+        if end == 0:
+            return 0
+
+        if self.offset == 0:
+            with open(self.filename, "rb") as f:
+                self.head = f.read(HEAD_BYTES)
+
+        body = chunk[:end]
+        self.offset += end
+
+        if self.columns is None:
+            header, _, body = body.partition(b"\n")
+            self._header = header.strip()
+            self.columns = self._header.decode().split(",")
+
+        # a restarted plugin may write its header again
+        if self._header in body:
+            lines = body.split(b"\n")
+            body = b"\n".join(line for line in lines if line.strip() != self._header)
+        if not body.strip():
+            return 0
+
+        rows = np.loadtxt(io.BytesIO(body), delimiter=",", dtype=self.dtype, ndmin=2)
+        self._chunks.append(rows)
+        self._data = None
+        self._nrows += len(rows)
+        return len(rows)
+
+    def _meta(self) -> dict | None:
+        try:
+            with open(os.path.join(self.sidecar, "meta.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _load(self) -> int:
+        # picks up whatever another reader has parsed since this one last
+        # looked, as long as it was parsed from the same file
+        meta = self._meta()
+        if meta is None or meta["nrows"] <= self._nrows or meta["dtype"] != self.dtype.str:
+            return 0
+
+        head = meta["head"].encode("latin-1")
+        if self._nrows and head != self.head:
+            return 0
+        with open(self.filename, "rb") as f:
+            if f.read(len(head)) != head:
+                return 0
+        if os.path.getsize(self.filename) < meta["offset"]:
+            return 0
+
+        if self.columns is None:
+            self.columns = meta["columns"]
+            self._header = ",".join(self.columns).encode()
+
+        # the rows file can run past nrows if a writer died before updating
+        # the manifest, so only nrows are ever read
+        ncols = len(self.columns)
+        count = (meta["nrows"] - self._nrows) * ncols
+        with open(os.path.join(self.sidecar, "rows.bin"), "rb") as f:
+            f.seek(self._nrows * ncols * self.dtype.itemsize)
+            rows = np.fromfile(f, dtype=self.dtype, count=count).reshape(-1, ncols)
+
+        self._chunks.append(rows)
+        self._data = None
+        self._nrows = meta["nrows"]
+        self.offset = meta["offset"]
+        self.head = head
+        return len(rows)
+
+    def _save(self):
+        if self.columns is None:
+            return
+
+        meta = self._meta()
+        rows_file = os.path.join(self.sidecar, "rows.bin")
+        stored = meta["nrows"] if meta and meta["head"].encode("latin-1") == self.head else 0
+        if meta and (stored > self._nrows or (stored, meta["offset"]) == (self._nrows, self.offset)):
+            return
+
+        # rows are stored row-major, so appending never rewrites old ones
+        data = self._data if self._data is not None else np.concatenate(self._chunks)
+        self._chunks = [data]
+        self._data = data
+
+        with open(rows_file, "r+b" if os.path.exists(rows_file) else "wb") as f:
+            f.truncate(stored * data.shape[1] * self.dtype.itemsize)
+            f.seek(0, os.SEEK_END)
+            data[stored:].tofile(f)
+
+        meta = {
+            "columns": self.columns,
+            "dtype": self.dtype.str,
+            "nrows": self._nrows,
+            "offset": self.offset,
+            "head": self.head.decode("latin-1"),
+        }
+        tmp = os.path.join(self.sidecar, f"meta.{os.getpid()}.tmp.json")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(self.sidecar, "meta.json"))
+
+
+def sidecar_dir(filename: str) -> str:
+    return f"{filename}.cols"
+
+
+def remove(filename: str):
+    # deletes a csv along with its sidecar
+    if os.path.exists(filename):
+        os.remove(filename)
+    shutil.rmtree(sidecar_dir(filename), ignore_errors=True)
+
+
+def trim(filename: str, t_end: float, tcol: str = "t") -> int:
+    # drops the rows after t_end, such as those a run wrote past the
+    # checkpoint it is restarted from, along with any half-written last line,
+    # returning how many went. the sidecar is cleared under its lock, as it
+    # may hold the dropped rows, and rebuilt by the next reader
+    if not os.path.exists(filename):
+        return 0
+
+    sidecar = sidecar_dir(filename)
+    lock = None
+    if os.path.isdir(sidecar):
+        lock = open(os.path.join(sidecar, ".lock"), "w")
+        fcntl.flock(lock, fcntl.LOCK_EX)
+
+    root, ext = os.path.splitext(filename)
+    tmp = f"{root}.{os.getpid()}.tmp{ext}"
+    dropped = 0
+
+    try:
+        with open(filename, "rb") as src, open(tmp, "wb") as dst:
+            header = src.readline()
+            dst.write(header)
+            col = header.decode().strip().split(",").index(tcol)
+
+            for line in src:
+                if not line.endswith(b"\n"):
+                    dropped += 1
+                elif not line.strip():
+                    continue
+                elif line.strip() == header.strip() or float(line.split(b",")[col]) <= t_end:
+                    dst.write(line)
+                else:
+                    dropped += 1
+
+        os.replace(tmp, filename)
+
+        if lock is not None:
+            for name in ["meta.json", "rows.bin"]:
+                if os.path.exists(os.path.join(sidecar, name)):
+                    os.remove(os.path.join(sidecar, name))
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        if lock is not None:
+            lock.close()
+
+    return dropped
+
+
+def read(filename: str, sidecar: bool = True) -> CSVTail:
+    tail = CSVTail(filename, sidecar)
+    tail.update()
+    return tail
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="brings a pyfr csv's columnar sidecar up to date and summarises it"
+    )
+    parser.add_argument("csv", nargs="+")
+    parser.add_argument(
+        "-f", "--follow", type=float, metavar="SECONDS", help="keep polling at this interval"
+    )
+    args = parser.parse_args()
+
+    tails = [CSVTail(filename) for filename in args.csv]
+    while True:
+        for tail in tails:
+            start = time.perf_counter()
+            new = tail.update()
+            elapsed = time.perf_counter() - start
+
+            last = ""
+            if len(tail) and "t" in tail:
+                last = f", t = {tail['t'][-1]:g}"
+            print(f"{tail.filename}: {len(tail)} rows (+{new} in {elapsed:.2f} s){last}")
+
+        if args.follow is None:
+            break
+        time.sleep(args.follow)
+
+
+if __name__ == "__main__":
+    main()
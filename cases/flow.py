@@ -0,0 +1,83 @@
+import configparser
+from math import sqrt
+
+# solution points of an order p element of each type
+SOLUTION_POINTS = {
+    "tri": lambda p: (p + 1) * (p + 2) // 2,
+    "quad": lambda p: (p + 1) ** 2,
+    "tet": lambda p: (p + 1) * (p + 2) * (p + 3) // 6,
+    "pri": lambda p: (p + 1) ** 2 * (p + 2) // 2,
+    "pyr": lambda p: (p + 1) * (p + 2) * (2 * p + 3) // 6,
+    "hex": lambda p: (p + 1) ** 3,
+}
+
+# solution-sized registers each time integrator keeps
+SCHEME_REGISTERS = {"euler": 2, "tvd-rk3": 3, "rk34": 3, "rk4": 3, "rk45": 3}
+
+
+def read_ini(filename: str) -> configparser.ConfigParser:
+    # pyfr's keys are case sensitive and it expands its own %(name)s macros,
+    # so a case file is read, and written back, with neither touched
+    cfg = configparser.ConfigParser(interpolation=None)
+    cfg.optionxform = str
+    if not cfg.read(filename):
+        raise FileNotFoundError(filename)
+    return cfg
+
+
+def ini_number(cfg: configparser.ConfigParser, section: str, key: str) -> float:
+    # the case files keep comments after their values
+    return float(cfg.get(section, key).split("#")[0].split(";")[0])
+
+
+def freestream(cfg: configparser.ConfigParser) -> dict:
+    # the cases name their freestream rho_in, u_in, p_in or rho_inf, u_inf,
+    # p_inf, or like the tgv just give p_0 with unit density and velocity
+    constants = "constants"
+    for suffix in ["_in", "_inf", "_0"]:
+        if cfg.has_option(constants, f"p{suffix}"):
+            break
+    else:
+        raise KeyError("no freestream pressure among the constants")
+
+    def constant(name: str, default: float) -> float:
+        if cfg.has_option(constants, name):
+            return ini_number(cfg, constants, name)
+        return default
+
+    gamma = ini_number(cfg, constants, "gamma")
+    rho = constant(f"rho{suffix}", 1.0)
+    u = constant(f"u{suffix}", 1.0)
+    p = ini_number(cfg, constants, f"p{suffix}")
+
+    if cfg.has_option(constants, "Re"):
+        reynolds = ini_number(cfg, constants, "Re")
+    else:
+        reynolds = rho * u / ini_number(cfg, constants, "mu")
+
+    return {
+        "reynolds": reynolds,
+        "mach": u / sqrt(gamma * p / rho),
+        "order": int(ini_number(cfg, "solver", "order")),
+    }
+
+
+def stable_dt(
+    h_min: float, order: int, mach: float, reynolds: float = 2.3e6, cfl: float = 0.5
+) -> tuple[float, str]:
+    # the tighter of the acoustic and viscous explicit limits for an order p
+    # flux reconstruction scheme on the smallest element, in freestream units
+    dt_conv = cfl * h_min / ((1.0 + 1.0 / mach) * (2 * order + 1))
+    dt_visc = cfl * reynolds * h_min**2 / (order + 1) ** 4
+    return (dt_conv, "convective") if dt_conv <= dt_visc else (dt_visc, "viscous")
+
+
+def memory_estimate(
+    dofs: int, ndims: int, precision: str = "double", scheme: str = "rk4"
+) -> float:
+    # a rough upper estimate in bytes: the integrator's registers plus the
+    # gradients and flux point scratch of a navier-stokes run, all roughly
+    # solution sized
+    nbytes = 8 if precision == "double" else 4
+    registers = SCHEME_REGISTERS.get(scheme, 3)
+    return dofs * nbytes * (registers + 3 * ndims + 2)
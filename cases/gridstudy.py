@@ -0,0 +1,174 @@
+import argparse
+import json
+import os
+from math import sqrt
+
+import flow
+import inlet
+import mshout
+
+
+def family(
+    target_y_plus: float,
+    reynolds: float,
+    order: int,
+    mach: float,
+    levels: int = 3,
+    refinement: float = sqrt(2.0),
+    lc: tuple[float, float, float] = (0.1, 0.2, 2.0),
+    bl_ratio: float = 1.1,
+    bl_thickness: float = 0.5,
+    cfl: float = 0.5,
+) -> list[dict]:
+    # coarsest first, each member refined by the same factor in both the wall
+    # spacing and the element sizes, with the finest at the target y+
+    members = []
+    for k in range(levels):
+        coarsen = refinement ** (levels - 1 - k)
+        y_plus = target_y_plus * coarsen
+        h_first = inlet.first_element_height(y_plus, reynolds, order)
+        dt, limit = flow.stable_dt(h_first, order, mach, reynolds, cfl)
+
+        members.append(
+            {
+                "name": f"g{k}",
+                "y_plus": y_plus,
+                "first_height": h_first,
+                "layers": inlet.boundary_layer_layers(
+                    h_first, bl_ratio, bl_thickness / inlet.InletGeometry().chord
+                ),
+                "mesh": {
+                    "target_y_plus": y_plus,
+                    "reynolds": reynolds,
+                    "order": order,
+                    "lc_near": lc[0] * coarsen,
+                    "lc_mid": lc[1] * coarsen,
+                    "lc_far": lc[2] * coarsen,
+                    "bl_ratio": bl_ratio,
+                    "bl_thickness": bl_thickness,
+                },
+                "overrides": {
+                    "solver": {"order": str(order)},
+                    "solver-time-integrator": {"dt": f"{dt:.3e}"},
+                },
+                "dt_limit": limit,
+            }
+        )
+
+    return members
+
+
+def write_ini(template: str, filename: str, overrides: dict):
+    cfg = flow.read_ini(template)
+    for section, values in overrides.items():
+        for key, value in values.items():
+            cfg.set(section, key, value)
+
+    with open(filename, "w") as f:
+        cfg.write(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="generates a grid-independence family of unstructured inlet meshes, sized "
+        "from a target y+, with a matching case file and stable dt for each"
+    )
+    parser.add_argument("ini", help="the case file to take Re, Mach and order from")
+    parser.add_argument("--y-plus", type=float, default=1.0, help="y+ of the finest mesh")
+    parser.add_argument("--reynolds", type=float, help="overrides Re from the case file")
+    parser.add_argument("--order", type=int, help="overrides the order from the case file")
+    parser.add_argument("--mach", type=float, help="overrides the freestream Mach number")
+    parser.add_argument("-n", "--levels", type=int, default=3)
+    parser.add_argument(
+        "-r", "--refinement", type=float, default=sqrt(2.0), help="size ratio between levels"
+    )
+    parser.add_argument(
+        "--lc",
+        type=float,
+        nargs=3,
+        default=[0.1, 0.2, 2.0],
+        metavar=("NEAR", "MID", "FAR"),
+        help="element sizes of the finest mesh, in mm",
+    )
+    parser.add_argument("--bl-ratio", type=float, default=1.1)
+    parser.add_argument(
+        "--bl-thickness", type=float, default=0.5, help="boundary layer thickness, in mm"
+    )
+    parser.add_argument("--cfl", type=float, default=0.5)
+    parser.add_argument("-o", "--outdir", default="gridstudy")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="write the case files and summary without meshing"
+    )
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--import", dest="pyfr_import", action="store_true")
+    args = parser.parse_args()
+
+    try:
+        cfg = flow.read_ini(args.ini)
+    except FileNotFoundError:
+        parser.error(f"cannot read {args.ini}")
+
+    fs = flow.freestream(cfg)
+    reynolds = args.reynolds or fs["reynolds"]
+    order = args.order if args.order is not None else fs["order"]
+    mach = args.mach or fs["mach"]
+
+    members = family(
+        args.y_plus,
+        reynolds,
+        order,
+        mach,
+        args.levels,
+        args.refinement,
+        tuple(args.lc),
+        args.bl_ratio,
+        args.bl_thickness,
+        args.cfl,
+    )
+
+    print(f"Re = {reynolds:.3g}, M = {mach:.3g}, order {order}")
+    print(f"{'name':<5} {'y+':>7} {'h first':>10} {'layers':>6} {'dt':>10}  limit")
+    for m in members:
+        dt = m["overrides"]["solver-time-integrator"]["dt"]
+        print(
+            f"{m['name']:<5} {m['y_plus']:>7.3g} {m['first_height']:>10.3e} "
+            f"{m['layers']:>6} {dt:>10}  {m['dt_limit']}"
+        )
+
+    cache = inlet.MeshCache(enabled=not args.no_cache)
+    g = inlet.InletGeometry()
+
+    for m in members:
+        rundir = os.path.join(args.outdir, m["name"])
+        os.makedirs(rundir, exist_ok=True)
+        write_ini(args.ini, os.path.join(rundir, "case.ini"), m["overrides"])
+
+        if not args.dry_run:
+            cache.get(
+                os.path.join(rundir, "mesh.msh"),
+                inlet.build_unstructured_2d,
+                g,
+                binary=mshout.MSH_BINARY,
+                pyfr_import=args.pyfr_import,
+                size_field=True,
+                fan_elements=10,
+                **m["mesh"],
+            )
+
+    with open(os.path.join(args.outdir, "study.json"), "w") as f:
+        json.dump(
+            {
+                "ini": os.path.abspath(args.ini),
+                "reynolds": reynolds,
+                "mach": mach,
+                "order": order,
+                "cfl": args.cfl,
+                "members": members,
+            },
+            f,
+            indent=2,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,738 @@
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+from math import ceil, log, radians, sqrt, tan
+
+import gmsh
+
+import mshout
+
+# bump when a change outside this file alters the meshes, e.g. in mshout
+CACHE_VERSION = 1
+CACHE_DIR = os.environ.get(
+    "INLET_MESH_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "inlet-meshes")
+)
+
+
+class InletGeometry:
+    # the di vanna mixed-compression inlet, with the intake dimensions given
+    # in mm and every length scaled by the chord
+    def __init__(
+        self,
+        domain_length: float = 1.05,
+        domain_height: float = 0.36,
+        chord: float = 150.0,
+        intake_length: float = 150.0,
+        intake_height: float = 44.0,
+        throat_height: float = 15.0,
+        ramp_length: float = 81.7,
+        ramp_height: float = 21.0,
+        ramp_angle_one: float = 10.0,
+        ramp_angle_two: float = 22.0,
+        cowl_angle: float = 30.0,
+        blunt_height: float = 0.0,
+    ):
+        self.domain_length = domain_length
+        self.domain_height = domain_height
+        self.chord = chord
+        self.scale_factor = 1.0 / chord
+
+        self.intake_length = intake_length * self.scale_factor
+        self.intake_height = intake_height * self.scale_factor
+        self.throat_height = throat_height * self.scale_factor
+        self.ramp_length = ramp_length * self.scale_factor
+        self.ramp_height = ramp_height * self.scale_factor
+        self.blunt_height = blunt_height * self.scale_factor
+
+        self.ramp_angle_one = ramp_angle_one
+        self.ramp_angle_two = ramp_angle_two
+        self.cowl_angle = cowl_angle
+
+        self._params = {
+            "domain_length": domain_length,
+            "domain_height": domain_height,
+            "chord": chord,
+            "intake_length": intake_length,
+            "intake_height": intake_height,
+            "throat_height": throat_height,
+            "ramp_length": ramp_length,
+            "ramp_height": ramp_height,
+            "ramp_angle_one": ramp_angle_one,
+            "ramp_angle_two": ramp_angle_two,
+            "cowl_angle": cowl_angle,
+            "blunt_height": blunt_height,
+        }
+
+    def params(self) -> dict:
+        return dict(self._params)
+
+    @property
+    def kink_length(self) -> float:
+        t1 = tan(radians(self.ramp_angle_one))
+        t2 = tan(radians(self.ramp_angle_two))
+        return (self.ramp_height - t2 * self.ramp_length) / (t1 - t2)
+
+    @property
+    def kink_height(self) -> float:
+        return tan(radians(self.ramp_angle_one)) * self.kink_length
+
+    @property
+    def y_throat(self) -> float:
+        # the top of the throat, where the cowl's inner wall sits
+        return self.ramp_height + self.throat_height
+
+    @property
+    def y_lip(self) -> float:
+        # the top of the cowl's blunt leading edge
+        return self.y_throat + self.blunt_height
+
+    @property
+    def x_start(self) -> float:
+        return 0.0
+
+    @property
+    def x_end(self) -> float:
+        return self.domain_length
+
+    @property
+    def x_ramp_start(self) -> float:
+        return self.domain_length - self.intake_length
+
+    @property
+    def x_kink(self) -> float:
+        return self.x_ramp_start + self.kink_length
+
+    @property
+    def x_throat_start(self) -> float:
+        return self.x_ramp_start + self.ramp_length
+
+    @property
+    def x_cowl_tip(self) -> float:
+        return self.x_throat_start + (self.intake_height - self.y_lip) / tan(
+            radians(self.cowl_angle)
+        )
+
+
+def wall_spacing(target_y_plus: float, reynolds: float = 2.3e6) -> float:
+    # first cell height for a target y+, from a turbulent flat-plate skin
+    # friction estimate in freestream units
+    mu = 1.0 / reynolds
+    rho = 1.0
+    u_inf = 1.0
+
+    skin_friction_coeff = 0.0592 * (reynolds**-0.2)
+    tau_w = 0.5 * rho * (u_inf**2) * skin_friction_coeff
+    u_tau = sqrt(tau_w / rho)
+
+    return (target_y_plus * mu) / (rho * u_tau)
+
+
+def first_element_height(
+    target_y_plus: float, reynolds: float = 2.3e6, order: int | None = None
+) -> float:
+    # at order p the first solution point sits roughly 1 / (p + 1) of the way
+    # across the wall element, so the element can be p + 1 times the spacing
+    h_wall = wall_spacing(target_y_plus, reynolds)
+    return h_wall if order is None else h_wall * (order + 1)
+
+
+def boundary_layer_layers(first_height: float, ratio: float, thickness: float) -> int:
+    # how many geometrically growing layers the boundary layer field stacks
+    # up to reach its thickness
+    return ceil(log(1.0 + thickness * (ratio - 1.0) / first_height) / log(ratio))
+
+
+def build_structured_2d(
+    g: InletGeometry,
+    nx_total: int = 1024,
+    nx_length: float = 1.05,
+    ny_bottom: int = 380,
+    ny_top: int = 380,
+    bottom_progression: float = 1.005,
+    throat_bump: float = 0.05,
+    top_progression: float = 1.01,
+):
+    gmsh.model.add("inlet-structured")
+    geo = gmsh.model.geo
+
+    x_start, x_ramp_start, x_kink = g.x_start, g.x_ramp_start, g.x_kink
+    x_throat_start, x_cowl_tip, x_end = g.x_throat_start, g.x_cowl_tip, g.x_end
+    y_split = g.y_throat
+
+    # --- mesh resolution ---
+    dx_constant = nx_length / nx_total
+
+    nx_1 = int(round((x_ramp_start - x_start) / dx_constant))
+    nx_2 = int(round((x_kink - x_ramp_start) / dx_constant))
+    nx_3 = int(round((x_throat_start - x_kink) / dx_constant))
+    nx_cowl = int(round((x_cowl_tip - x_throat_start) / dx_constant))
+    nx_wake = int(round((x_end - x_cowl_tip) / dx_constant))
+    nx_throat = nx_cowl + nx_wake
+
+    # --- points and line ---
+
+    # bottom
+    p1 = geo.addPoint(x_start, 0, 0)
+    p2 = geo.addPoint(x_ramp_start, 0, 0)
+    p3 = geo.addPoint(x_kink, g.kink_height, 0)
+    p4 = geo.addPoint(x_throat_start, g.ramp_height, 0)
+    p5 = geo.addPoint(x_end, g.ramp_height, 0)
+
+    # middle split
+    p6 = geo.addPoint(x_start, y_split, 0)
+    p7 = geo.addPoint(x_ramp_start, y_split, 0)
+    p8 = geo.addPoint(x_kink, y_split, 0)
+    p9 = geo.addPoint(x_throat_start, y_split, 0)
+
+    # cowl
+    p10 = geo.addPoint(x_cowl_tip, g.intake_height, 0)
+    p11 = geo.addPoint(x_end, g.intake_height, 0)
+    p12 = geo.addPoint(x_end, y_split, 0)
+
+    # top
+    p13 = geo.addPoint(x_start, g.domain_height, 0)
+    p14 = geo.addPoint(x_ramp_start, g.domain_height, 0)
+    p15 = geo.addPoint(x_kink, g.domain_height, 0)
+    p16 = geo.addPoint(x_throat_start, g.domain_height, 0)
+    p17 = geo.addPoint(x_cowl_tip, g.domain_height, 0)
+    p18 = geo.addPoint(x_end, g.domain_height, 0)
+
+    # horizontal lines
+    l_bottom = geo.addLine(p1, p2)
+    l_wall_1 = geo.addLine(p2, p3)
+    l_wall_2 = geo.addLine(p3, p4)
+    l_throat_bot = geo.addLine(p4, p5)
+
+    l_mid_1 = geo.addLine(p6, p7)
+    l_mid_2 = geo.addLine(p7, p8)
+    l_mid_3 = geo.addLine(p8, p9)
+    l_throat_top = geo.addLine(p12, p9)
+
+    l_cowl_top = geo.addLine(p9, p10)
+    l_cowl_back = geo.addLine(p10, p11)
+
+    l_top_1 = geo.addLine(p13, p14)
+    l_top_2 = geo.addLine(p14, p15)
+    l_top_3 = geo.addLine(p15, p16)
+    l_top_4 = geo.addLine(p16, p17)
+    l_top_5 = geo.addLine(p17, p18)
+
+    # vertical lines
+    l_inlet_bot = geo.addLine(p1, p6)
+    l_inlet_top = geo.addLine(p6, p13)
+    l_v1_bot = geo.addLine(p2, p7)
+    l_v1_top = geo.addLine(p7, p14)
+    l_v2_bot = geo.addLine(p3, p8)
+    l_v2_top = geo.addLine(p8, p15)
+    l_throat_inlet = geo.addLine(p4, p9)
+    l_v3 = geo.addLine(p9, p16)
+    l_v4 = geo.addLine(p10, p17)
+    l_out_int = geo.addLine(p5, p12)
+    l_out_ext = geo.addLine(p11, p18)
+
+    # surfaces
+    s1_b = geo.addPlaneSurface([geo.addCurveLoop([l_bottom, l_v1_bot, -l_mid_1, -l_inlet_bot])])
+    s2_b = geo.addPlaneSurface([geo.addCurveLoop([l_wall_1, l_v2_bot, -l_mid_2, -l_v1_bot])])
+    s3_b = geo.addPlaneSurface(
+        [geo.addCurveLoop([l_wall_2, l_throat_inlet, -l_mid_3, -l_v2_bot])]
+    )
+    s4 = geo.addPlaneSurface(
+        [geo.addCurveLoop([l_throat_bot, l_out_int, l_throat_top, -l_throat_inlet])]
+    )
+    s1_t = geo.addPlaneSurface([geo.addCurveLoop([l_mid_1, l_v1_top, -l_top_1, -l_inlet_top])])
+    s2_t = geo.addPlaneSurface([geo.addCurveLoop([l_mid_2, l_v2_top, -l_top_2, -l_v1_top])])
+    s3_t = geo.addPlaneSurface([geo.addCurveLoop([l_mid_3, l_v3, -l_top_3, -l_v2_top])])
+    s5 = geo.addPlaneSurface([geo.addCurveLoop([l_cowl_top, l_v4, -l_top_4, -l_v3])])
+    s6 = geo.addPlaneSurface([geo.addCurveLoop([l_cowl_back, l_out_ext, -l_top_5, -l_v4])])
+
+    geo.synchronize()
+
+    # --- transfinite mesh settings ---
+    mesh = gmsh.model.mesh
+
+    # horizontal transfinite curves
+    for line in [l_bottom, l_mid_1, l_top_1]:
+        mesh.setTransfiniteCurve(line, nx_1)
+    for line in [l_wall_1, l_mid_2, l_top_2]:
+        mesh.setTransfiniteCurve(line, nx_2)
+    for line in [l_wall_2, l_mid_3, l_top_3]:
+        mesh.setTransfiniteCurve(line, nx_3)
+    for line in [l_throat_bot, l_throat_top]:
+        mesh.setTransfiniteCurve(line, nx_throat)
+    for line in [l_cowl_top, l_top_4]:
+        mesh.setTransfiniteCurve(line, nx_cowl)
+    for line in [l_cowl_back, l_top_5]:
+        mesh.setTransfiniteCurve(line, nx_wake)
+
+    # vertical transfinite curves
+    for line in [l_inlet_bot, l_v1_bot, l_v2_bot]:
+        mesh.setTransfiniteCurve(line, ny_bottom, "Progression", bottom_progression)
+    for line in [l_throat_inlet, l_out_int]:
+        mesh.setTransfiniteCurve(line, ny_bottom, "Bump", throat_bump)
+    for line in [l_inlet_top, l_v1_top, l_v2_top, l_v3, l_v4, l_out_ext]:
+        mesh.setTransfiniteCurve(line, ny_top, "Progression", top_progression)
+
+    # transfinite surfaces
+    mesh.setTransfiniteSurface(s1_b, cornerTags=[p1, p2, p7, p6])
+    mesh.setTransfiniteSurface(s2_b, cornerTags=[p2, p3, p8, p7])
+    mesh.setTransfiniteSurface(s3_b, cornerTags=[p3, p4, p9, p8])
+    mesh.setTransfiniteSurface(s1_t, cornerTags=[p6, p7, p14, p13])
+    mesh.setTransfiniteSurface(s2_t, cornerTags=[p7, p8, p15, p14])
+    mesh.setTransfiniteSurface(s3_t, cornerTags=[p8, p9, p16, p15])
+    mesh.setTransfiniteSurface(s4, cornerTags=[p4, p5, p12, p9])
+    mesh.setTransfiniteSurface(s5, cornerTags=[p9, p10, p17, p16])
+    mesh.setTransfiniteSurface(s6, cornerTags=[p10, p11, p18, p17])
+
+    # --- physical groups ---
+    inlet_lines = [l_inlet_bot, l_inlet_top]
+    top_lines = [l_top_1, l_top_2, l_top_3, l_top_4, l_top_5]
+    wall_lines = [l_wall_1, l_wall_2, l_throat_bot, l_throat_top, l_cowl_top, l_cowl_back]
+
+    all_surfaces = [s1_b, s1_t, s2_b, s2_t, s3_b, s3_t, s4, s5, s6]
+    gmsh.model.addPhysicalGroup(2, all_surfaces, name="fluid")
+    gmsh.model.addPhysicalGroup(1, inlet_lines + top_lines + [l_out_ext], name="farfield")
+    gmsh.model.addPhysicalGroup(1, [l_out_int], name="outlet")
+    gmsh.model.addPhysicalGroup(1, [l_bottom], name="bottom")
+    gmsh.model.addPhysicalGroup(1, wall_lines, name="wall")
+
+    gmsh.option.setNumber("Mesh.RecombineAll", 1)
+    gmsh.option.setNumber("Mesh.Smoothing", 10)
+    mesh.generate(2)
+
+
+def build_unstructured_2d(
+    g: InletGeometry,
+    target_y_plus: float = 10.0,
+    reynolds: float = 2.3e6,
+    lc_near: float = 0.1,
+    lc_mid: float = 0.5,
+    lc_far: float = 1.0,
+    size_field: bool = False,
+    fan_elements: int | None = None,
+    order: int | None = None,
+    bl_ratio: float = 1.1,
+    bl_thickness: float = 0.5,
+):
+    # lc_* and bl_thickness are in mm, like the intake dimensions
+    gmsh.model.add("inlet-unstructured")
+    geo = gmsh.model.geo
+    field = gmsh.model.mesh.field
+    scale_factor = g.scale_factor
+
+    h_wall = first_element_height(target_y_plus, reynolds, order)
+    est_dt = 0.1 * h_wall / 1.5
+
+    print(f"Target y+: {target_y_plus}")
+    print(f"Calculated First Cell Height: {h_wall:.4e}")
+    print(f"Estimated Max Time Step (dt): ~{est_dt:.4e}")
+
+    lc_near *= scale_factor
+    lc_mid *= scale_factor
+    lc_far *= scale_factor
+
+    # points
+    points = [
+        geo.addPoint(g.x_start, 0, 0, lc_mid),
+        geo.addPoint(g.x_ramp_start, 0, 0, lc_near),
+        geo.addPoint(g.x_kink, g.kink_height, 0, lc_near),
+        geo.addPoint(g.x_throat_start, g.ramp_height, 0, lc_near),
+        geo.addPoint(g.x_end, g.ramp_height, 0, lc_near),
+        geo.addPoint(g.x_end, g.y_throat, 0, lc_near),
+        geo.addPoint(g.x_throat_start, g.y_throat, 0, lc_near),
+        geo.addPoint(g.x_cowl_tip, g.intake_height, 0, lc_near),
+        geo.addPoint(g.x_end, g.intake_height, 0, lc_near),
+        geo.addPoint(g.x_end, g.domain_height, 0, lc_mid),
+        geo.addPoint(g.x_start, g.domain_height, 0, lc_far),
+    ]
+    p1, _, _, p4, p5, p6, p7, p8, p9, _, _ = points
+
+    # lines, closing the loop back to the first point
+    lines = [geo.addLine(points[i], points[(i + 1) % len(points)]) for i in range(len(points))]
+    walls = [lines[i] for i in [1, 2, 3, 5, 6, 7]]
+
+    # curve loop & surface
+    surface = geo.addPlaneSurface([geo.addCurveLoop(lines)])
+
+    geo.synchronize()
+
+    # fields
+    if size_field:
+        distance = field.add("Distance")
+        field.setNumbers(distance, "CurvesList", walls)
+
+        threshold = field.add("Threshold")
+        field.setNumber(threshold, "InField", distance)
+        field.setNumber(threshold, "SizeMin", lc_near)
+        field.setNumber(threshold, "SizeMax", lc_far)
+        field.setNumber(threshold, "DistMax", 100 * scale_factor)
+        field.setNumber(threshold, "DistMin", 5 * scale_factor)
+        field.setAsBackgroundMesh(threshold)
+
+    bl = field.add("BoundaryLayer")
+    field.setNumbers(bl, "CurvesList", [lines[0]] + walls)
+    field.setNumbers(bl, "PointsList", [p1, p5, p6, p9])
+    field.setNumbers(bl, "FanPointsList", [p4, p7, p8])
+    field.setNumber(bl, "Size", h_wall)
+    field.setNumber(bl, "Ratio", bl_ratio)
+    field.setNumber(bl, "Thickness", bl_thickness * scale_factor)
+    field.setNumber(bl, "Quads", 1)
+    field.setAsBoundaryLayer(bl)
+
+    # physical groups
+    gmsh.model.addPhysicalGroup(2, [surface], name="fluid")
+    gmsh.model.addPhysicalGroup(1, [lines[i] for i in [8, 9, 10]], name="farfield")
+    gmsh.model.addPhysicalGroup(1, [lines[4]], name="outlet")
+    gmsh.model.addPhysicalGroup(1, [lines[0]], name="bottom")
+    gmsh.model.addPhysicalGroup(1, walls, name="wall")
+
+    gmsh.option.setNumber("Mesh.Algorithm", 6)
+    if fan_elements is not None:
+        gmsh.option.setNumber("Mesh.BoundaryLayerFanElements", fan_elements)
+
+    # even with identical inputs, gmsh can place a handful of triangles
+    # differently from one process to the next, so only a cached mesh is
+    # exactly reproducible
+    gmsh.model.mesh.generate(2)
+
+
+def build_structured_3d(
+    g: InletGeometry,
+    nx_total: int = 256,
+    ny_bottom: int = 90,
+    ny_mid: int = 7,
+    ny_top: int = 32,
+    nz_total: int = 20,
+    z_extrude: float = 0.1,
+):
+    gmsh.model.add("inlet-structured-3d")
+    geom = gmsh.model.geo
+    mesh = gmsh.model.mesh
+
+    x_start, x_ramp_start, x_kink = g.x_start, g.x_ramp_start, g.x_kink
+    x_throat_start, x_cowl_tip, x_end = g.x_throat_start, g.x_cowl_tip, g.x_end
+    y_split_bot = g.y_throat
+    y_split_top = g.y_lip
+    domain_height = g.domain_height
+
+    dx_constant = g.domain_length / nx_total
+
+    nx_1 = int(round((x_ramp_start - x_start) / dx_constant))
+    nx_2 = int(round((x_kink - x_ramp_start) / dx_constant))
+    nx_3 = int(round((x_throat_start - x_kink) / dx_constant))
+    nx_cowl = int(round((x_cowl_tip - x_throat_start) / dx_constant))
+    nx_wake = int(round((x_end - x_cowl_tip) / dx_constant))
+    nx_throat = nx_cowl + nx_wake - 1
+
+    p1 = geom.addPoint(x_start, 0, 0)
+    p2 = geom.addPoint(x_ramp_start, 0, 0)
+    p3 = geom.addPoint(x_kink, g.kink_height, 0)
+    p4 = geom.addPoint(x_throat_start, g.ramp_height, 0)
+    p5 = geom.addPoint(x_end, g.ramp_height, 0)
+
+    p6 = geom.addPoint(x_start, y_split_bot, 0)
+    p7 = geom.addPoint(x_ramp_start, y_split_bot, 0)
+    p8 = geom.addPoint(x_kink, y_split_bot, 0)
+    p9 = geom.addPoint(x_throat_start, y_split_bot, 0)
+    p10 = geom.addPoint(x_end, y_split_bot, 0)
+
+    p11 = geom.addPoint(x_start, y_split_top, 0)
+    p12 = geom.addPoint(x_ramp_start, y_split_top, 0)
+    p13 = geom.addPoint(x_kink, y_split_top, 0)
+    p14 = geom.addPoint(x_throat_start, y_split_top, 0)
+    p15 = geom.addPoint(x_cowl_tip, g.intake_height, 0)
+
+    p16 = geom.addPoint(x_start, domain_height, 0)
+    p17 = geom.addPoint(x_ramp_start, domain_height, 0)
+    p18 = geom.addPoint(x_kink, domain_height, 0)
+    p19 = geom.addPoint(x_throat_start, domain_height, 0)
+    p20 = geom.addPoint(x_cowl_tip, domain_height, 0)
+
+    l1 = geom.addLine(p1, p2)
+    l2 = geom.addLine(p2, p3)
+    l3 = geom.addLine(p3, p4)
+    l4 = geom.addLine(p4, p5)
+    l5 = geom.addLine(p6, p7)
+    l6 = geom.addLine(p7, p8)
+    l7 = geom.addLine(p8, p9)
+    l8 = geom.addLine(p9, p10)
+    l9 = geom.addLine(p11, p12)
+    l10 = geom.addLine(p12, p13)
+    l11 = geom.addLine(p13, p14)
+    l12 = geom.addLine(p14, p15)
+    l13 = geom.addLine(p16, p17)
+    l14 = geom.addLine(p17, p18)
+    l15 = geom.addLine(p18, p19)
+    l16 = geom.addLine(p19, p20)
+
+    l17 = geom.addLine(p1, p6)
+    l18 = geom.addLine(p2, p7)
+    l19 = geom.addLine(p3, p8)
+    l20 = geom.addLine(p4, p9)
+    l21 = geom.addLine(p5, p10)
+    l22 = geom.addLine(p6, p11)
+    l23 = geom.addLine(p7, p12)
+    l24 = geom.addLine(p8, p13)
+    l25 = geom.addLine(p9, p14)
+    l26 = geom.addLine(p11, p16)
+    l27 = geom.addLine(p12, p17)
+    l28 = geom.addLine(p13, p18)
+    l29 = geom.addLine(p14, p19)
+    l30 = geom.addLine(p15, p20)
+
+    loops = [
+        [l1, l18, -l5, -l17],
+        [l2, l19, -l6, -l18],
+        [l3, l20, -l7, -l19],
+        [l4, l21, -l8, -l20],
+        [l5, l23, -l9, -l22],
+        [l6, l24, -l10, -l23],
+        [l7, l25, -l11, -l24],
+        [l9, l27, -l13, -l26],
+        [l10, l28, -l14, -l27],
+        [l11, l29, -l15, -l28],
+        [l12, l30, -l16, -l29],
+    ]
+    all_surfaces = [geom.addPlaneSurface([geom.addCurveLoop(loop)]) for loop in loops]
+    s1, s2, s3, s4, s5, s6, s7, s8, s9, s10, s11 = all_surfaces
+
+    surfaces_extrude = [(2, s) for s in all_surfaces]
+    extruded_entities = geom.extrude(
+        surfaces_extrude, 0, 0, z_extrude, numElements=[nz_total], recombine=True
+    )
+
+    # extrude returns, for each surface in turn, its top, its volume and then
+    # the surface swept out by each curve of its loop in order, which maps
+    # every line straight to its extruded surface without a geometric search
+    swept = {}
+    tops = []
+    volumes = []
+    i = 0
+    for loop in loops:
+        (_, top), (_, volume), *sides = extruded_entities[i : i + 2 + len(loop)]
+        tops.append(top)
+        volumes.append(volume)
+        swept.update((abs(line), side) for line, (_, side) in zip(loop, sides))
+        i += 2 + len(loop)
+
+    geom.synchronize()
+
+    for line in [l1, l5, l9, l13]:
+        mesh.setTransfiniteCurve(line, nx_1)
+    for line in [l2, l6, l10, l14]:
+        mesh.setTransfiniteCurve(line, nx_2)
+    for line in [l3, l7, l11, l15]:
+        mesh.setTransfiniteCurve(line, nx_3)
+    for line in [l4, l8]:
+        mesh.setTransfiniteCurve(line, nx_throat)
+    for line in [l12, l16]:
+        mesh.setTransfiniteCurve(line, nx_cowl)
+    for line in [l17, l18, l19]:
+        mesh.setTransfiniteCurve(line, ny_bottom, "Progression", 1.02)
+    for line in [l20, l21]:
+        mesh.setTransfiniteCurve(line, ny_bottom, "Bump", 0.6)
+    for line in [l22, l23, l24, l25]:
+        mesh.setTransfiniteCurve(line, ny_mid)
+    for line in [l26, l27, l28, l29, l30]:
+        mesh.setTransfiniteCurve(line, ny_top, "Progression", 1.1)
+
+    mesh.setTransfiniteSurface(s1, cornerTags=[p1, p2, p7, p6])
+    mesh.setTransfiniteSurface(s2, cornerTags=[p2, p3, p8, p7])
+    mesh.setTransfiniteSurface(s3, cornerTags=[p3, p4, p9, p8])
+    mesh.setTransfiniteSurface(s4, cornerTags=[p4, p5, p10, p9])
+
+    mesh.setTransfiniteSurface(s5, cornerTags=[p6, p7, p12, p11])
+    mesh.setTransfiniteSurface(s6, cornerTags=[p7, p8, p13, p12])
+    mesh.setTransfiniteSurface(s7, cornerTags=[p8, p9, p14, p13])
+
+    mesh.setTransfiniteSurface(s8, cornerTags=[p11, p12, p17, p16])
+    mesh.setTransfiniteSurface(s9, cornerTags=[p12, p13, p18, p17])
+    mesh.setTransfiniteSurface(s10, cornerTags=[p13, p14, p19, p18])
+    mesh.setTransfiniteSurface(s11, cornerTags=[p14, p15, p20, p19])
+
+    for s in all_surfaces:
+        mesh.setRecombine(2, s)
+
+    bottom_wall_surfs = [swept[line] for line in [l2, l3, l4]]
+    wall_surfs = [swept[line] for line in [l8, l25, l12]]
+    farfield_surfs = [swept[line] for line in [l17, l22, l26, l13, l14, l15, l16, l30]]
+    outlet_surfs = [swept[l21]]
+    symplane_surfs = [swept[l1]] + all_surfaces + tops
+
+    bottom_wall_group = gmsh.model.addPhysicalGroup(2, bottom_wall_surfs)
+    gmsh.model.setPhysicalName(2, bottom_wall_group, "bottom-wall")
+
+    wall_group = gmsh.model.addPhysicalGroup(2, wall_surfs)
+    gmsh.model.setPhysicalName(2, wall_group, "wall")
+
+    farfield_group = gmsh.model.addPhysicalGroup(2, farfield_surfs)
+    gmsh.model.setPhysicalName(2, farfield_group, "farfield")
+
+    outlet_group = gmsh.model.addPhysicalGroup(2, outlet_surfs)
+    gmsh.model.setPhysicalName(2, outlet_group, "outflow")
+
+    symplane_group = gmsh.model.addPhysicalGroup(2, symplane_surfs)
+    gmsh.model.setPhysicalName(2, symplane_group, "symplane")
+
+    fluid = gmsh.model.addPhysicalGroup(3, volumes)
+    gmsh.model.setPhysicalName(3, fluid, "fluid")
+
+    gmsh.option.setNumber("Mesh.RecombineAll", 1)
+    mesh.generate(3)
+
+
+class MeshCache:
+    # meshes stored under a hash of everything that goes into them: the
+    # builder, the geometry, the resolution, the output format and the source
+    # of this file, so a sweep only ever builds each distinct mesh once
+    def __init__(self, root: str = CACHE_DIR, enabled: bool = True):
+        self.root = root
+        self.enabled = enabled
+
+    def key(self, builder, g: InletGeometry, binary: bool, version: float, params: dict) -> str:
+        with open(os.path.abspath(__file__), "rb") as f:
+            source = hashlib.sha256(f.read()).hexdigest()
+
+        record = {
+            "builder": builder.__name__,
+            "geometry": g.params(),
+            "params": params,
+            "binary": binary,
+            "msh_version": version,
+            "source": source,
+            "cache_version": CACHE_VERSION,
+        }
+        return hashlib.sha256(json.dumps(record, sort_keys=True).encode()).hexdigest()
+
+    def entry(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def get(
+        self,
+        filename: str,
+        builder,
+        g: InletGeometry,
+        binary: bool = mshout.MSH_BINARY,
+        version: float = mshout.MSH_VERSION,
+        pyfr_import: bool = False,
+        **params,
+    ) -> bool:
+        # puts the mesh at filename (and its .pyfrm alongside if asked for),
+        # returning whether it had to be built
+        if not self.enabled:
+            _build(filename, builder, g, binary, version, params)
+            if pyfr_import:
+                _import(filename, _pyfrm_name(filename))
+            return True
+
+        key = self.key(builder, g, binary, version, params)
+        entry = self.entry(key)
+        os.makedirs(entry, exist_ok=True)
+        cached_msh = os.path.join(entry, "mesh.msh")
+        cached_pyfrm = os.path.join(entry, "mesh.pyfrm")
+
+        # concurrent setups of the same mesh wait for the first to build it
+        with open(os.path.join(entry, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+
+            built = not os.path.exists(cached_msh)
+            if built:
+                _build(cached_msh, builder, g, binary, version, params)
+                with open(os.path.join(entry, "params.json"), "w") as f:
+                    record = {"builder": builder.__name__, "geometry": g.params()}
+                    json.dump({**record, "params": params}, f, indent=2)
+
+            if pyfr_import and not os.path.exists(cached_pyfrm):
+                _import(cached_msh, cached_pyfrm)
+
+        _copy(cached_msh, filename)
+        if pyfr_import:
+            _copy(cached_pyfrm, _pyfrm_name(filename))
+
+        return built
+
+
+def _build(filename: str, builder, g: InletGeometry, binary: bool, version: float, params: dict):
+    gmsh.initialize()
+    try:
+        builder(g, **params)
+        mshout.write(filename, binary=binary, version=version)
+    finally:
+        gmsh.finalize()
+
+
+def _import(msh_file: str, pyfrm_file: str):
+    root, ext = os.path.splitext(pyfrm_file)
+    tmp = f"{root}.{os.getpid()}.tmp{ext}"
+    try:
+        subprocess.run(["pyfr", "import", msh_file, tmp], check=True)
+        os.replace(tmp, pyfrm_file)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _pyfrm_name(msh_file: str) -> str:
+    return os.path.splitext(msh_file)[0] + ".pyfrm"
+
+
+def _copy(src: str, dst: str):
+    # a copy rather than a hard link, as pyfr partition add and the like
+    # rewrite a mesh in place, which through a link would corrupt the cache
+    if os.path.abspath(src) == os.path.abspath(dst):
+        return
+
+    tmp = f"{dst}.{os.getpid()}.tmp"
+    try:
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def add_arguments(parser: argparse.ArgumentParser, default_output: str):
+    parser.add_argument("-o", "--output", default=default_output, help="the mesh filename")
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=f"always mesh from scratch rather than reusing a mesh from {CACHE_DIR}",
+    )
+    parser.add_argument(
+        "--import",
+        dest="pyfr_import",
+        action="store_true",
+        help="also produce the .pyfrm with pyfr import",
+    )
+    parser.add_argument(
+        "--binary",
+        action="store_true",
+        help="write binary msh, which pyfr import cannot read (default: ascii)",
+    )
+    parser.add_argument(
+        "--msh-version", type=float, choices=[2.2, 4.1], default=mshout.MSH_VERSION
+    )
+    parser.add_argument("--gui", action="store_true", help="open the mesh in gmsh afterwards")
+
+
+def make_mesh(args: argparse.Namespace, builder, g: InletGeometry, **params):
+    cache = MeshCache(enabled=not args.no_cache)
+    built = cache.get(
+        args.output,
+        builder,
+        g,
+        binary=mshout.MSH_BINARY or args.binary,
+        version=args.msh_version,
+        pyfr_import=args.pyfr_import,
+        **params,
+    )
+    print(f"{'built' if built else 'reused cached'} mesh {args.output}")
+
+    if args.gui:
+        gmsh.initialize()
+        gmsh.open(args.output)
+        gmsh.fltk.run()
+        gmsh.finalize()
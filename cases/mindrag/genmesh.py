@@ -5,9 +5,12 @@ import warnings
 
 import gmsh
 
-LENGTH = 1.0
-FARFIELD_RADIUS = 0.4
-UPSTREAM_OFFSET = -0.1
+import geometry
+from geometry import FARFIELD_RADIUS, LENGTH, UPSTREAM_OFFSET
+
+
+class MeshGenerationError(Exception):
+    pass
 
 
 def main():
@@ -136,10 +139,60 @@ def genmesh(
     filename: str | None = None,
     gui: bool = False,
 ):
+    gmsh.initialize()
+
+    try:
+        build_mesh(
+            dofs,
+            radius,
+            curve_type=curve_type,
+            no_revolve=no_revolve,
+            order=order,
+            mesh_refinement=mesh_refinement,
+            write_to_disk=write_to_disk,
+            filename=filename,
+        )
+
+        if gui:
+            gmsh.fltk.run()
+    finally:
+        gmsh.finalize()
+
+
+def init_worker():
+    # for long-lived worker processes, which keep gmsh initialised and call
+    # generate() once per design
+    gmsh.initialize(interruptible=False)
+    gmsh.option.setNumber("General.Terminal", 0)
+
+
+def generate(dofs: list[float], radius: float, filename: str, **kwargs):
+    gmsh.clear()
+
+    try:
+        build_mesh(dofs, radius, write_to_disk=True, filename=filename, **kwargs)
+    except Exception as e:
+        raise MeshGenerationError(f"failed to mesh dofs {dofs}: {e}") from None
+    finally:
+        gmsh.clear()
+
+
+def build_mesh(
+    dofs: list[float],
+    radius: float,
+    curve_type: str = "bezier_4",
+    no_revolve: bool = False,
+    order: int = 1,
+    mesh_refinement: str = "coarse",
+    write_to_disk: bool = False,
+    filename: str | None = None,
+):
+    # cheap to check and far cheaper than a failed mesh or solve
+    geometry.validate(dofs, radius, curve_type)
+
     dof_str = "_".join([f"{d:.3f}" for d in dofs])
     meshname = f"body_{curve_type}_{mesh_refinement}_{dof_str}"
 
-    gmsh.initialize()
     gmsh.model.add(meshname)
     geom = gmsh.model.geo
     model = gmsh.model
@@ -148,7 +201,6 @@ def genmesh(
     base = 1.06
     progression = math.pow(base, 1.0 / multiplier)
     inv_progression = math.pow(1.0 / base, 1.0 / multiplier)
-    n_spline_points = 200
 
     if curve_type.startswith("bezier"):
         p1 = geom.addPoint(0.0, 0.0, 0.0)
@@ -164,20 +216,8 @@ def genmesh(
             p_end = geom.addPoint(LENGTH, radius, 0.0)
             c2 = geom.addBezier([p1, p2, p3, p4, p_end])
     else:
-        exponent = dofs[0]
-        curve_points = []
-
-        for i in range(n_spline_points + 1):
-            theta = (i / n_spline_points) * (math.pi / 2.0)
-            x_val = LENGTH * (1.0 - math.cos(theta))
-
-            if x_val == 0.0:
-                y_val = 0.0
-            else:
-                y_val = radius * math.pow((x_val / LENGTH), exponent)
-
-            pt = geom.addPoint(x_val, y_val, 0.0)
-            curve_points.append(pt)
+        contour = geometry.powerlaw(dofs[0], radius).tolist()
+        curve_points = [geom.addPoint(x, y, 0.0) for x, y in contour]
 
         c2 = geom.addSpline(curve_points)
         p1 = curve_points[0]
@@ -266,11 +306,6 @@ def genmesh(
         else:
             gmsh.write(f"{meshname}.msh")
 
-    if gui:
-        gmsh.fltk.run()
-
-    gmsh.finalize()
-
 
 def _compute_base_radius(
     parser: argparse.ArgumentParser, fineness_ratio: float, length: float = LENGTH
@@ -0,0 +1,200 @@
+import argparse
+import math
+
+import numpy as np
+
+LENGTH = 1.0
+FARFIELD_RADIUS = 0.4
+UPSTREAM_OFFSET = -0.1
+
+# limits a design must meet before it is worth meshing
+MIN_CLEARANCE = 0.01
+MAX_CURVATURE = 1.0e4
+
+N_CONTOUR_POINTS = 200
+
+
+class InvalidGeometryError(Exception):
+    pass
+
+
+def bezier(ctrl: np.ndarray, n: int = N_CONTOUR_POINTS) -> np.ndarray:
+    # evaluates the curve at n + 1 evenly spaced parameter values through
+    # the bernstein basis, returning an (n + 1, 2) array
+    ctrl = np.asarray(ctrl, dtype=float)
+    k = len(ctrl) - 1
+    t = np.linspace(0.0, 1.0, n + 1)[:, None]
+    i = np.arange(k + 1)
+    coeffs = np.array([math.comb(k, j) for j in i])
+
+    basis = coeffs * t**i * (1.0 - t) ** (k - i)
+    return basis @ ctrl
+
+
+def powerlaw(exponent: float, radius: float, n: int = N_CONTOUR_POINTS) -> np.ndarray:
+    # cosine spacing clusters the points towards the nose
+    theta = np.linspace(0.0, math.pi / 2.0, n + 1)
+    x = LENGTH * (1.0 - np.cos(theta))
+    x[0] = 0.0
+    y = radius * (x / LENGTH) ** exponent
+
+    return np.column_stack([x, y])
+
+
+def control_points(dofs: list[float], radius: float, curve_type: str) -> np.ndarray:
+    if curve_type == "bezier_4":
+        return np.array(
+            [[0.0, 0.0], [0.0, dofs[0]], [dofs[1], dofs[2]], [LENGTH, radius]]
+        )
+    elif curve_type == "bezier_5":
+        return np.array(
+            [
+                [0.0, 0.0],
+                [0.0, dofs[0]],
+                [dofs[1], dofs[2]],
+                [dofs[3], dofs[4]],
+                [LENGTH, radius],
+            ]
+        )
+
+    raise ValueError(f"{curve_type} has no control points")
+
+
+def wall(
+    dofs: list[float], radius: float, curve_type: str, n: int = N_CONTOUR_POINTS
+) -> np.ndarray:
+    if curve_type == "powerlaw":
+        return powerlaw(dofs[0], radius, n)
+
+    return bezier(control_points(dofs, radius, curve_type), n)
+
+
+def farfield(radius: float, n: int = N_CONTOUR_POINTS) -> np.ndarray:
+    # the same curve genmesh uses, from the outflow end round to the axis
+    ctrl = [
+        [LENGTH - 0.2, FARFIELD_RADIUS],
+        [UPSTREAM_OFFSET, radius],
+        [UPSTREAM_OFFSET, 0.0],
+    ]
+    return bezier(ctrl, n)
+
+
+def curvature(pts: np.ndarray) -> np.ndarray:
+    # menger curvature of each interior point: 1 / the radius of the circle
+    # through it and its two neighbours
+    a = pts[1:-1] - pts[:-2]
+    b = pts[2:] - pts[1:-1]
+    c = pts[2:] - pts[:-2]
+
+    cross = np.abs(a[:, 0] * b[:, 1] - a[:, 1] * b[:, 0])
+    lengths = (
+        np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1) * np.linalg.norm(c, axis=1)
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(lengths > 0, 2.0 * cross / lengths, np.inf)
+
+
+def segments_intersect(p: np.ndarray, q: np.ndarray) -> np.ndarray:
+    # (len(p) - 1, len(q) - 1) mask of which segments of polyline p properly
+    # cross which segments of polyline q
+    p0, p1 = p[:-1, None], p[1:, None]
+    q0, q1 = q[None, :-1], q[None, 1:]
+
+    def orient(a, b, c):
+        return np.sign(
+            (b[..., 0] - a[..., 0]) * (c[..., 1] - a[..., 1])
+            - (b[..., 1] - a[..., 1]) * (c[..., 0] - a[..., 0])
+        )
+
+    d1 = orient(p0, p1, q0)
+    d2 = orient(p0, p1, q1)
+    d3 = orient(q0, q1, p0)
+    d4 = orient(q0, q1, p1)
+
+    return (d1 * d2 < 0) & (d3 * d4 < 0)
+
+
+def check(
+    dofs: list[float],
+    radius: float,
+    curve_type: str,
+    min_clearance: float = MIN_CLEARANCE,
+    max_curvature: float = MAX_CURVATURE,
+) -> list[str]:
+    # everything wrong with a design, empty if it is fine to mesh
+    problems = []
+    pts = wall(dofs, radius, curve_type)
+
+    if not np.all(np.isfinite(pts)):
+        return ["contour is not finite"]
+
+    dx = np.diff(pts[:, 0])
+    dy = np.diff(pts[:, 1])
+    if np.any(dx <= 0.0):
+        problems.append(f"contour doubles back in x near x = {pts[1:][dx <= 0.0][0, 0]:.4f}")
+    if np.any(dy < -1e-12):
+        problems.append(f"contour narrows near x = {pts[1:][dy < -1e-12][0, 0]:.4f}")
+    if np.any(pts[:, 1] < 0.0):
+        problems.append("contour crosses the axis")
+
+    # a contour which only moves forward in x cannot cross itself, so the
+    # quadratic pairwise test is only needed for the ones which do not
+    if np.any(dx <= 0.0) and np.triu(segments_intersect(pts, pts), k=2).any():
+        problems.append("contour intersects itself")
+
+    outer = farfield(radius, n=64)
+    gap = pts[:, None] - outer[None]
+    clearance = np.sqrt(np.min(gap[..., 0] ** 2 + gap[..., 1] ** 2))
+
+    # segments can only cross if some pair of their points is closer than
+    # the longest segment, so well-separated designs skip the pairwise test
+    longest = max(np.hypot(dx, dy).max(), np.hypot(*np.diff(outer, axis=0).T).max())
+    outflow = np.array([pts[-1], outer[0]])
+    if segments_intersect(pts[:-1], outflow).any() or (
+        clearance < longest and segments_intersect(pts, outer).any()
+    ):
+        problems.append("contour crosses the farfield boundary")
+
+    if pts[:, 1].max() >= FARFIELD_RADIUS or clearance < min_clearance:
+        problems.append(f"clearance to the farfield {clearance:.4f} below {min_clearance}")
+
+    # the nose point itself is left out, as a power law is singular there
+    kappa = curvature(pts)[1:]
+    if kappa.max() > max_curvature:
+        i = np.argmax(kappa) + 2
+        problems.append(
+            f"curvature {kappa.max():.1f} above {max_curvature} near x = {pts[i, 0]:.4f}"
+        )
+
+    return problems
+
+
+def validate(dofs: list[float], radius: float, curve_type: str, **kwargs):
+    problems = check(dofs, radius, curve_type, **kwargs)
+    if problems:
+        raise InvalidGeometryError(f"invalid geometry for dofs {dofs}: {'; '.join(problems)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="checks a body contour is valid before it is meshed"
+    )
+    parser.add_argument("dofs", help="the degrees of freedom at each control point")
+    parser.add_argument(
+        "--curve-type",
+        choices=["bezier_4", "bezier_5", "powerlaw"],
+        default="bezier_4",
+    )
+    parser.add_argument("--fineness", type=float, default=3.0)
+    args = parser.parse_args()
+
+    dofs = [float(d) for d in args.dofs.split(",")]
+    problems = check(dofs, LENGTH / (2 * args.fineness), args.curve_type)
+
+    for p in problems:
+        print(p)
+    print("invalid" if problems else "valid")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,70 @@
 import argparse
+import configparser
+import fcntl
+import hashlib
+import json
+import multiprocessing as mp
 import os
+import queue
 import shutil
+import signal
+import sqlite3
 import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import closing, contextmanager
 
 import egobox as egx
 import numpy as np
-import pandas as pd
+
+import genmesh
+import geometry
+from genmesh import MeshGenerationError
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import csvtail
+import flow
+import partcache
+import restart
 
 os.environ["EGOR_USE_RUN_RECORDER"] = "WITH_ITER_STATE"
 
+LENGTH = 1.0
+FINENESS_RATIO = 3.0
+AREA_REF = np.pi * (LENGTH / FINENESS_RATIO) ** 2 / 4.0
+
+# the drag is averaged over this window, once the bow shock has formed
+T_AVG_START = 1.0
+T_AVG_END = 2.0
+
+
+def drag_coefficient(px_gauge):
+    return px_gauge / (0.5 * AREA_REF)
+
 
 class EnvConfig:
-    def __init__(self, env_type: str, n_gpus: int = 1):
+    def __init__(
+        self,
+        env_type: str,
+        n_gpus: int = 1,
+        n_workers: int = 1,
+        backend: str = "cuda",
+        mesh_refinement: str = "coarse",
+        cd_rtol: float | None = None,
+        warm_start: bool = False,
+        warm_transient: float = 0.25,
+    ):
         self.n_gpus = n_gpus
-        
+        self.n_workers = n_workers
+        self.backend = backend
+        self.mesh_refinement = mesh_refinement
+        self.cd_rtol = cd_rtol
+        self.warm_start = warm_start
+        self.warm_transient = warm_transient
+
         if env_type == "hpc":
             self.scratch_dir = "/scratch/users/k24108571/"
             self.home_dir = "/users/k24108571/"
@@ -27,44 +78,476 @@ class EnvConfig:
             self.default_shape = "powerlaw"
 
         self.mindrag_dir = os.path.join(self.home_dir, "pyfr", "cases", "mindrag")
-        self.genmesh_path = os.path.join(self.mindrag_dir, "genmesh.py")
         self.ini_template_file = os.path.join(self.mindrag_dir, "euler.ini")
 
+    @property
+    def ini_hash(self) -> str:
+        with open(self.ini_template_file, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
 
 CONFIG = EnvConfig("local")
 
 
-class SimulationManager:
-    id: int = 1
+class Fidelity:
+    # one rung of the evaluation ladder; order and tend left as None keep
+    # the values in the ini template
+    def __init__(
+        self, refinement: str = "coarse", order: int | None = None, tend: float | None = None
+    ):
+        self.refinement = refinement
+        self.order = order
+        self.tend = tend
 
-    def __init__(self, dofs: list[float]):
-        self.dofs = dofs
-        self.rundir = os.path.join(
-            CONFIG.working_dir, f"mindrag-run-{SimulationManager.id}"
+    @classmethod
+    def parse(cls, spec: str) -> "Fidelity":
+        # refinement[:order[:tend]], e.g. coarse:1:1.5
+        parts = spec.split(":")
+        order = int(parts[1]) if len(parts) > 1 and parts[1] else None
+        tend = float(parts[2]) if len(parts) > 2 and parts[2] else None
+        return cls(parts[0], order, tend)
+
+    @property
+    def tag(self) -> str:
+        # the plain refinement for the template setup, so cache entries
+        # written before the ladder existed are still found
+        tag = self.refinement
+        if self.order is not None:
+            tag += f"-p{self.order}"
+        if self.tend is not None:
+            tag += f"-t{self.tend:g}"
+        return tag
+
+    def __str__(self) -> str:
+        return self.tag
+
+
+class DragCache:
+    # persistent drag values keyed by the rounded design vector, the curve
+    # type, the mesh refinement and the solver configuration, so restarted
+    # or repeated optimisations never pay for the same simulation twice
+    def __init__(self, path: str, decimals: int = 6, enabled: bool = True):
+        self.path = path
+        self.decimals = decimals
+        self.enabled = enabled
+
+    def _connect(self) -> sqlite3.Connection:
+        # one short-lived connection per call keeps this safe across threads,
+        # and sqlite's own locking keeps it safe across processes
+        db = sqlite3.connect(self.path, timeout=60.0)
+        db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS drag (
+                key TEXT PRIMARY KEY,
+                dofs TEXT NOT NULL,
+                curve_type TEXT NOT NULL,
+                refinement TEXT NOT NULL,
+                ini_hash TEXT NOT NULL,
+                drag REAL NOT NULL,
+                rundir TEXT,
+                created REAL NOT NULL
+            )
+            """
         )
-        self.meshfile = f"mesh-{SimulationManager.id}.msh"
-        SimulationManager._increment_simulation_id()
+        return db
 
-    def compute_drag(self) -> float:
+    def key(self, sim: "SimulationManager") -> str:
+        return "|".join(
+            [
+                self.rounded_dofs(sim.dofs),
+                sim.curve_type,
+                sim.fidelity.tag,
+                CONFIG.ini_hash,
+            ]
+        )
+
+    def rounded_dofs(self, dofs: list[float]) -> str:
+        # + 0.0 folds -0.0 into 0.0 so both give the same key
+        return ",".join(f"{round(d, self.decimals) + 0.0:.{self.decimals}f}" for d in dofs)
+
+    def get(self, sim: "SimulationManager") -> float | None:
+        if not self.enabled:
+            return None
+
+        with closing(self._connect()) as db:
+            row = db.execute(
+                "SELECT drag FROM drag WHERE key = ?", (self.key(sim),)
+            ).fetchone()
+
+        return row[0] if row else None
+
+    def put(self, sim: "SimulationManager", drag: float):
+        # failures may be down to the machine rather than the design, so only
+        # successful evaluations are remembered
+        if not self.enabled or not np.isfinite(drag):
+            return
+
+        with closing(self._connect()) as db, db:
+            db.execute(
+                "INSERT OR REPLACE INTO drag VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self.key(sim),
+                    self.rounded_dofs(sim.dofs),
+                    sim.curve_type,
+                    sim.fidelity.tag,
+                    CONFIG.ini_hash,
+                    float(drag),
+                    sim.rundir,
+                    time.time(),
+                ),
+            )
+
+    def nearest(self, sim: "SimulationManager") -> list[str]:
+        # run directories of the evaluated designs which share sim's mesh
+        # topology and solver setup, closest in dofs space first
+        if not self.enabled:
+            return []
+
+        with closing(self._connect()) as db:
+            rows = db.execute(
+                "SELECT dofs, rundir FROM drag WHERE curve_type = ? AND refinement = ?"
+                " AND ini_hash = ? AND rundir IS NOT NULL",
+                (sim.curve_type, sim.fidelity.tag, CONFIG.ini_hash),
+            ).fetchall()
+
+        x = np.array(sim.dofs)
+        dist = [np.linalg.norm(np.array(dofs.split(","), dtype=float) - x) for dofs, _ in rows]
+        return [rows[i][1] for i in np.argsort(dist) if rows[i][1] != sim.rundir]
+
+
+CACHE = DragCache(os.path.join(CONFIG.working_dir, "drag-cache.sqlite"))
+PARTITIONS = partcache.PartitionCache(os.path.join(CONFIG.working_dir, "partition-cache"))
+
+
+class DevicePool:
+    # hands each concurrent evaluation its own set of n_gpus devices, worker
+    # i getting devices [i * n_gpus, (i + 1) * n_gpus)
+    def __init__(self, config: EnvConfig):
+        self.slots = queue.Queue()
+        for i in range(config.n_workers):
+            self.slots.put(list(range(i * config.n_gpus, (i + 1) * config.n_gpus)))
+
+    def run(self, sim: "SimulationManager") -> float:
+        devices = self.slots.get()
         try:
-            self._setup_directory()
-            self._genmesh()
-            self._pyfr_import_mesh()
-            self._pyfr_partition_mesh()
-            self._pyfr_run()
-            return self._extract_drag()
-        except subprocess.CalledProcessError:
-            return np.nan
-        except FileNotFoundError:
+            return sim.compute_drag(devices)
+        finally:
+            self.slots.put(devices)
+
+
+DEVICES = DevicePool(CONFIG)
+
+
+class MeshWorkers:
+    # long-lived processes which keep gmsh initialised between designs; gmsh
+    # is not thread-safe, so each concurrent evaluation needs its own process
+    def __init__(self, n_workers: int):
+        self.n_workers = n_workers
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.n_workers,
+                    mp_context=mp.get_context("spawn"),
+                    initializer=genmesh.init_worker,
+                )
+            return self._pool
+
+    def generate(self, dofs: list[float], filename: str, **kwargs):
+        pool = self._get_pool()
+        radius = LENGTH / (2 * FINENESS_RATIO)
+
+        try:
+            pool.submit(genmesh.generate, dofs, radius, filename, **kwargs).result()
+        except BrokenProcessPool:
+            # gmsh took its worker down with it; start afresh next time
+            with self._lock:
+                if self._pool is pool:
+                    self._pool = None
+            raise MeshGenerationError(f"mesh worker died while meshing dofs {dofs}")
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+
+MESHER = MeshWorkers(CONFIG.n_workers)
+
+
+class DragMonitor:
+    # follows force.csv while pyfr is running and decides when the averaged
+    # drag has settled: the averaging window is split into batches, and the
+    # run is converged once the standard error of the batch means and the
+    # drift between the two halves of the window are both below rtol * |cd|
+    poll_interval = 10.0
+
+    def __init__(
+        self,
+        force_file: str,
+        rtol: float,
+        t_start: float = T_AVG_START,
+        n_batches: int = 10,
+        min_window: float = 0.25,
+        px0: float | None = None,
+    ):
+        self.force_file = force_file
+        self.rtol = rtol
+        self.t_start = t_start
+        self.n_batches = n_batches
+        self.min_window = min_window
+
+        self._tail = csvtail.CSVTail(force_file)
+        self._px0 = px0
+        self.t = np.empty(0)
+        self.cd = np.empty(0)
+        self.stats = {}
+
+    def update(self) -> bool:
+        # parses any complete rows written since the last call, returning
+        # whether there were any
+        if not self._tail.update():
+            return False
+
+        px = self._tail["px"]
+        if self._px0 is None:
+            self._px0 = float(px[0])
+
+        self.t = self._tail["t"]
+        self.cd = drag_coefficient(px - self._px0)
+        return True
+
+    def converged(self) -> bool:
+        cd = self.cd[self.t >= self.t_start]
+        t = self.t[self.t >= self.t_start]
+
+        if len(cd) < 2 * self.n_batches or t[-1] - self.t_start < self.min_window:
+            return False
+
+        mean = cd.mean()
+        batch_means = [b.mean() for b in np.array_split(cd, self.n_batches)]
+        stderr = np.std(batch_means, ddof=1) / np.sqrt(self.n_batches)
+        first, second = np.array_split(cd, 2)
+        drift = abs(second.mean() - first.mean())
+
+        self.stats = {
+            "t": float(t[-1]),
+            "n_samples": len(cd),
+            "cd_mean": float(mean),
+            "cd_stderr": float(stderr),
+            "cd_drift": float(drift),
+        }
+
+        tol = self.rtol * abs(mean)
+        return bool(stderr <= tol and drift <= tol)
+
+    def record(self, path: str, stopped: bool):
+        record = {
+            "criterion": (
+                f"batch-means stderr and half-window drift of cd over "
+                f"t >= {self.t_start} both <= rtol * |mean cd|"
+            ),
+            "rtol": self.rtol,
+            "n_batches": self.n_batches,
+            "min_window": self.min_window,
+            "stopped_early": stopped,
+            **self.stats,
+        }
+
+        with open(path, "w") as f:
+            json.dump(record, f, indent=2)
+
+
+class SimulationManager:
+    def __init__(self, dofs: list[float], fidelity: Fidelity | None = None):
+        self.dofs = dofs
+        self.fidelity = fidelity if fidelity else Fidelity(CONFIG.mesh_refinement)
+
+        # the run id is derived from the design itself, so it is the same in
+        # every process and on every restart, and two designs never collide
+        self.id = hashlib.sha256(CACHE.key(self).encode()).hexdigest()[:16]
+        self.rundir = os.path.join(CONFIG.working_dir, f"mindrag-run-{self.id}")
+        self.meshfile = f"mesh-{self.id}.msh"
+
+        # the averaging window and the freestream px which is subtracted off,
+        # both of which move when the run is restarted from another design
+        self.t_avg = self.cold_window
+        self.px0 = None
+        self.donor = None
+
+    def compute_drag(self, devices: list[int] | None = None) -> float:
+        # designs which could never mesh are turned away before they cost
+        # anything, and not cached, as the limits may change
+        try:
+            geometry.validate(self.dofs, LENGTH / (2 * FINENESS_RATIO), self.curve_type)
+        except geometry.InvalidGeometryError as e:
+            print(e)
             return np.nan
 
+        # whoever holds the lock owns the run directory; anyone evaluating the
+        # same design meanwhile waits here and then picks up the cached value
+        with self._lock_rundir():
+            cached = CACHE.get(self)
+            if cached is not None:
+                print(f"cache hit for dofs {self.dofs_string}: drag {cached}")
+                return cached
+
+            try:
+                self._setup_directory()
+                self._assign_devices(devices)
+                self._genmesh()
+                self._pyfr_import_mesh()
+                self._pyfr_partition_mesh()
+
+                donor = self._find_donor() if CONFIG.warm_start else None
+                if donor is None:
+                    self._pyfr_run(devices)
+                else:
+                    try:
+                        self._warm_start(devices, *donor)
+                    except (subprocess.CalledProcessError, OSError, KeyError) as e:
+                        print(f"warm start of dofs {self.dofs_string} failed ({e}), starting cold")
+                        self._reset_run(devices)
+                        self._pyfr_run(devices)
+
+                drag = self._extract_drag()
+                if not np.isfinite(drag):
+                    self._write_failure("no finite drag in the averaging window")
+                    return np.nan
+
+                self._write_result(drag)
+                CACHE.put(self, drag)
+                return drag
+            except MeshGenerationError as e:
+                print(e)
+                self._write_failure(str(e))
+                return np.nan
+            except (subprocess.CalledProcessError, FileNotFoundError) as e:
+                self._write_failure(str(e))
+                return np.nan
+
+    @contextmanager
+    def _lock_rundir(self):
+        os.makedirs(CONFIG.working_dir, exist_ok=True)
+
+        # flock rather than a counter, as it holds across threads (each open
+        # gets its own lock) and across separate optimiser processes
+        with open(f"{self.rundir}.lock", "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    @property
+    def result_file(self) -> str:
+        return os.path.join(self.rundir, "result.json")
+
+    @property
+    def failure_file(self) -> str:
+        return os.path.join(self.rundir, "failure.json")
+
     def _setup_directory(self):
-        if os.path.exists(self.rundir):
+        if os.path.exists(self.result_file):
+            # a completed run which is being redone, e.g. with the cache
+            # disabled; keep it rather than throwing it away
+            archive = f"{self.rundir}-{time.strftime('%Y%m%d-%H%M%S')}"
+            os.rename(self.rundir, archive)
+            print(f"kept previous run of dofs {self.dofs_string} in {archive}")
+        elif os.path.exists(self.rundir):
+            # an unfinished or failed attempt at this same design, which we
+            # now own and try again
             shutil.rmtree(self.rundir)
 
         os.makedirs(self.rundir)
         os.makedirs(os.path.join(self.rundir, "out"))
-        shutil.copy(CONFIG.ini_template_file, os.path.join(self.rundir, "case.ini"))
+        self._write_ini()
+
+    def _write_ini(self):
+        ini_file = os.path.join(self.rundir, "case.ini")
+        shutil.copy(CONFIG.ini_template_file, ini_file)
+
+        if self.fidelity.order is None and self.fidelity.tend is None:
+            return
+
+        cfg = flow.read_ini(ini_file)
+        if self.fidelity.order is not None:
+            cfg.set("solver", "order", str(self.fidelity.order))
+        if self.fidelity.tend is not None:
+            cfg.set("solver-time-integrator", "tend", str(self.fidelity.tend))
+
+        with open(ini_file, "w") as f:
+            cfg.write(f)
+
+    @property
+    def cold_window(self) -> tuple[float, float]:
+        # a shortened run averages over whatever it has past the transient
+        t_end = self.fidelity.tend if self.fidelity.tend is not None else T_AVG_END
+        return (T_AVG_START, t_end)
+
+    def _write_result(self, drag: float):
+        result = {
+            "dofs": self.dofs,
+            "curve_type": self.curve_type,
+            "mesh_refinement": self.mesh_refinement,
+            "fidelity": self.fidelity.tag,
+            "drag": drag,
+            "px_gauge_offset": self.px0,
+            "t_avg": list(self.t_avg),
+            "warm_start_donor": self.donor,
+        }
+        self._write_json(self.result_file, result)
+
+    def _write_failure(self, error: str):
+        # only a finished run gets a result.json, which is what marks it done
+        # and keeps it from being thrown away; a failed one is noted here for
+        # whoever looks, and its directory is cleared on the next attempt
+        if not os.path.isdir(self.rundir):
+            return
+
+        failure = {
+            "dofs": self.dofs,
+            "curve_type": self.curve_type,
+            "mesh_refinement": self.mesh_refinement,
+            "fidelity": self.fidelity.tag,
+            "error": error,
+            "warm_start_donor": self.donor,
+            "failed": time.time(),
+        }
+        self._write_json(self.failure_file, failure)
+
+    def _write_json(self, path: str, record: dict):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(record, f, indent=2)
+        os.replace(tmp, path)
+
+    def _assign_devices(self, devices: list[int] | None):
+        # a single-rank run is pinned to its device directly, whereas
+        # multi-rank runs keep local-rank and are restricted through the
+        # environment in _pyfr_run
+        if (
+            devices is None
+            or CONFIG.n_workers == 1
+            or CONFIG.backend == "openmp"
+            or len(devices) > 1
+        ):
+            return
+
+        ini_file = os.path.join(self.rundir, "case.ini")
+        cfg = flow.read_ini(ini_file)
+
+        section = f"backend-{CONFIG.backend}"
+        if not cfg.has_section(section):
+            cfg.add_section(section)
+        cfg.set(section, "device-id", str(devices[0]))
+
+        with open(ini_file, "w") as f:
+            cfg.write(f)
 
     @property
     def ndofs(self) -> int:
@@ -74,31 +557,27 @@ class SimulationManager:
     def dofs_string(self) -> str:
         return ",".join(map(str, self.dofs))
 
-    def _genmesh(self):
+    @property
+    def curve_type(self) -> str:
         if self.ndofs == 1:
-            curve_type = "powerlaw"
+            return "powerlaw"
         elif self.ndofs == 3:
-            curve_type = "bezier_4"
+            return "bezier_4"
         else:
-            curve_type = "bezier_5"
+            return "bezier_5"
 
-        subprocess.run(
-            [
-                "python",
-                CONFIG.genmesh_path,
-                self.dofs_string,
-                f"--curve-type={curve_type}",
-                f"--filename={self.meshfile}",
-                "--write-out",
-                "--mesh-refinement=coarse",
-            ],
-            cwd=self.rundir,
-            check=True,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL
-        )
+    @property
+    def mesh_refinement(self) -> str:
+        return self.fidelity.refinement
 
-        subprocess.run(["clear"])
+    def _genmesh(self):
+        MESHER.generate(
+            self.dofs,
+            os.path.join(self.rundir, self.meshfile),
+            curve_type=self.curve_type,
+            order=2,
+            mesh_refinement=self.mesh_refinement,
+        )
 
     def _pyfr_import_mesh(self):
         subprocess.run(
@@ -106,35 +585,152 @@ class SimulationManager:
         )
 
     def _pyfr_partition_mesh(self):
-        if CONFIG.n_gpus > 1:
-            subprocess.run(
-                [
-                    "pyfr", "partition", "add", "-f", "-p", "scotch", 
-                    "-e", "pri:1", "-e", "hex:1", "mesh.pyfrm", str(CONFIG.n_gpus)
-                ],
-                cwd=self.rundir,
-                check=True
-            )
+        mesh = os.path.join(self.rundir, "mesh.pyfrm")
+        PARTITIONS.get(mesh, mesh, CONFIG.n_gpus, "scotch", {"pri": 1, "hex": 1})
+
+    def _find_donor(self) -> tuple[str, str, float] | None:
+        # the meshes are transfinite, so every design of the same curve type
+        # and refinement has the same elements in the same order, and a
+        # donor's solution carries over element for element. a donor's last
+        # solution may have been cut short, so it is the newest intact one
+        for rundir in CACHE.nearest(self):
+            try:
+                with open(os.path.join(rundir, "result.json")) as f:
+                    result = json.load(f)
+
+                px0 = result.get("px_gauge_offset")
+                if px0 is None:
+                    # written before offsets were recorded, so started cold
+                    px0 = float(csvtail.read(os.path.join(rundir, "force.csv"))["px"][0])
+
+                out_dir = os.path.join(rundir, "out")
+                solns = [
+                    os.path.join(out_dir, f)
+                    for f in os.listdir(out_dir)
+                    if f.endswith(".pyfrs")
+                ]
+            except (OSError, KeyError, IndexError, ValueError):
+                continue
+
+            for soln in sorted(solns, key=os.path.getmtime, reverse=True):
+                if restart.check_solution(soln) is not None:
+                    return rundir, soln, px0
+
+        return None
+
+    def _warm_start(self, devices: list[int] | None, rundir: str, soln: str, px0: float):
+        import h5py
+
+        restart_file = os.path.join(self.rundir, "warm-start.pyfrs")
+        shutil.copy(soln, restart_file)
+
+        # pyfr refuses a solution whose mesh uuid is not that of the mesh
+        with (
+            h5py.File(os.path.join(self.rundir, "mesh.pyfrm"), "r") as mesh,
+            h5py.File(restart_file, "r+") as f,
+        ):
+            key = "mesh-uuid" if "mesh-uuid" in f else "mesh_uuid"
+            uuid = mesh[key][()]
+            del f[key]
+            f[key] = uuid
+
+            stats = configparser.ConfigParser(inline_comment_prefixes=("#", ";"))
+            stats.read_string(f["stats"][()].decode())
+            tcurr = stats.getfloat("solver-time-integrator", "tcurr")
+
+        # the shock is already in place, so only the adjustment to the new
+        # shape has to be waited out before averaging
+        t_start = tcurr + CONFIG.warm_transient
+        window = self.cold_window[1] - self.cold_window[0]
+        self.t_avg = (t_start, t_start + window)
+        self.px0 = px0
+        self.donor = rundir
+
+        ini_file = os.path.join(self.rundir, "case.ini")
+        cfg = flow.read_ini(ini_file)
+        cfg.set("solver-time-integrator", "tend", str(self.t_avg[1]))
+        with open(ini_file, "w") as f:
+            cfg.write(f)
+
+        print(f"warm starting dofs {self.dofs_string} from {rundir} at t = {tcurr}")
+        self._pyfr_run(devices, restart_file="warm-start.pyfrs")
+
+    def _reset_run(self, devices: list[int] | None):
+        self.t_avg = self.cold_window
+        self.px0 = None
+        self.donor = None
+
+        csvtail.remove(os.path.join(self.rundir, "force.csv"))
+        for name in ["convergence.json", "warm-start.pyfrs"]:
+            if os.path.exists(os.path.join(self.rundir, name)):
+                os.remove(os.path.join(self.rundir, name))
+
+        shutil.rmtree(os.path.join(self.rundir, "out"))
+        os.makedirs(os.path.join(self.rundir, "out"))
+        self._write_ini()
+        self._assign_devices(devices)
+
+    def _pyfr_run(self, devices: list[int] | None = None, restart_file: str | None = None):
+        if restart_file is None:
+            cmd = ["pyfr", "-p", "run", "-b", CONFIG.backend, "mesh.pyfrm", "case.ini"]
+        else:
+            cmd = [
+                "pyfr", "-p", "restart", "-b", CONFIG.backend,
+                "mesh.pyfrm", restart_file, "case.ini"
+            ]
 
-    def _pyfr_run(self):
-        cmd = [
-            "pyfr",
-            "-p",
-            "run",
-            "-b",
-            "cuda",
-            "mesh.pyfrm",
-            "case.ini",
-        ]
-        
         if CONFIG.n_gpus > 1:
             cmd = ["mpiexec", "-n", str(CONFIG.n_gpus)] + cmd
 
-        subprocess.run(
-            cmd,
-            cwd=self.rundir,
-            check=True,
-        )
+        env = None
+        if devices is not None and CONFIG.n_workers > 1:
+            env = os.environ.copy()
+            if CONFIG.backend == "openmp":
+                # share the cores out between the concurrent runs
+                env["OMP_NUM_THREADS"] = str(max(1, os.cpu_count() // CONFIG.n_workers))
+            elif len(devices) > 1:
+                visible = {"cuda": "CUDA_VISIBLE_DEVICES", "hip": "HIP_VISIBLE_DEVICES"}
+                env[visible[CONFIG.backend]] = ",".join(map(str, devices))
+
+        monitor = None
+        if CONFIG.cd_rtol is not None:
+            monitor = DragMonitor(
+                os.path.join(self.rundir, "force.csv"),
+                CONFIG.cd_rtol,
+                t_start=self.t_avg[0],
+                px0=self.px0,
+            )
+
+        # a session of its own lets us stop mpiexec and all of its ranks
+        proc = subprocess.Popen(cmd, cwd=self.rundir, env=env, start_new_session=True)
+        stopped = False
+
+        try:
+            while True:
+                try:
+                    proc.wait(timeout=DragMonitor.poll_interval)
+                    break
+                except subprocess.TimeoutExpired:
+                    pass
+
+                if monitor and monitor.update() and monitor.converged():
+                    print(f"drag converged for dofs {self.dofs_string}, stopping pyfr")
+                    os.killpg(proc.pid, signal.SIGTERM)
+                    proc.wait()
+                    stopped = True
+                    break
+        except BaseException:
+            os.killpg(proc.pid, signal.SIGTERM)
+            proc.wait()
+            raise
+
+        if monitor:
+            monitor.update()
+            monitor.converged()
+            monitor.record(os.path.join(self.rundir, "convergence.json"), stopped)
+
+        if not stopped and proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, cmd)
 
     def _extract_drag(self) -> float:
         force_file = os.path.join(self.rundir, "force.csv")
@@ -142,40 +738,132 @@ class SimulationManager:
             return np.nan
 
         try:
-            data = pd.read_csv(force_file)
-            initial_px = data["px"].iloc[0]
-            data["px_gauge"] = data["px"] - initial_px
-
-            length = 1.0
-            fineness_ratio = 3.0
-            diameter = length / fineness_ratio
-            area_ref = np.pi * (diameter**2) / 4.0
-
-            data_avg = data[(data["t"] >= 1.0) & (data["t"] <= 2.0)]
-
-            if data_avg.empty:
+            # the monitor has already parsed most of it into the sidecar
+            data = csvtail.read(force_file)
+            px = data["px"]
+            if self.px0 is None:
+                # a cold start begins from the uniform freestream
+                self.px0 = float(px[0])
+
+            # a run stopped early by the monitor simply ends inside the window
+            in_window = data.between(*self.t_avg)
+            if not in_window.any():
                 return np.nan
 
-            cd_avg = data_avg["px_gauge"] / (0.5 * area_ref)
-            return float(cd_avg.mean())
+            return float(drag_coefficient(px[in_window] - self.px0).mean())
         except Exception:
             return np.nan
 
-    @classmethod
-    def _increment_simulation_id(cls):
-        cls.id += 1
 
+class FidelityLadder:
+    # screens every candidate at the cheapest fidelity and only promotes the
+    # promising ones up the ladder; the gap between consecutive levels is
+    # learnt from the designs run at both and added on, so every design gets
+    # an estimate of its drag at the top level
+    def __init__(
+        self, levels: list[Fidelity], promote_frac: float = 0.25, min_promoted: int = 3
+    ):
+        self.levels = levels
+        self.promote_frac = promote_frac
+        self.min_promoted = min_promoted
+
+        self.samples = [{} for _ in levels]
+        self.best = {}
+
+    def _key(self, x: np.ndarray) -> tuple:
+        return tuple(np.round(x, CACHE.decimals))
+
+    def correction(self, level: int, x: np.ndarray) -> float:
+        # additive correction from level to level + 1: the mean gap plus a
+        # gaussian kernel interpolant of what is left
+        pairs = [
+            (k, self.samples[level + 1][k] - y)
+            for k, y in self.samples[level].items()
+            if k in self.samples[level + 1]
+        ]
+        if not pairs:
+            return 0.0
 
-def evaluate_hypersonic_drag(x):
-    x = np.atleast_2d(x)
-    results = []
+        xs = np.array([k for k, _ in pairs])
+        gap = np.array([g for _, g in pairs])
+        mean = gap.mean()
+        if len(gap) < 3:
+            return float(mean)
+
+        # length scale of 0.3 of the spread of the paired designs
+        scale = 0.3 * np.ptp(xs, axis=0)
+        scale[scale == 0] = 1.0
+        xs = xs / scale
+        x = np.asarray(x) / scale
+
+        K = np.exp(-0.5 * np.sum((xs[:, None] - xs[None]) ** 2, axis=-1))
+        w = np.linalg.solve(K + 1e-6 * np.eye(len(gap)), gap - mean)
+        k = np.exp(-0.5 * np.sum((xs - x) ** 2, axis=-1))
+        return float(mean + k @ w)
+
+    def estimate(self, x: np.ndarray, level: int, y: float) -> float:
+        return y + sum(self.correction(l, x) for l in range(level, len(self.levels) - 1))
+
+    def _threshold(self) -> float:
+        estimates = [self.estimate(x, l, y) for x, l, y in self.best.values()]
+        return float(np.quantile(estimates, self.promote_frac))
+
+    def _run(self, level: int, x: np.ndarray) -> list[float]:
+        sims = [SimulationManager(xi.tolist(), self.levels[level]) for xi in x]
+
+        with ThreadPoolExecutor(max_workers=CONFIG.n_workers) as pool:
+            results = list(pool.map(DEVICES.run, sims))
+
+        for xi, y in zip(x, results):
+            if np.isfinite(y):
+                self.samples[level][self._key(xi)] = y
+                self.best[self._key(xi)] = (xi, level, y)
+
+        return results
+
+    def evaluate(self, x: np.ndarray) -> np.ndarray:
+        x = np.atleast_2d(x)
+
+        y = np.array(self._run(0, x))
+        active = [i for i in range(len(x)) if np.isfinite(y[i])]
+
+        for level in range(1, len(self.levels)):
+            if not active:
+                break
+
+            if len(self.samples[level]) < self.min_promoted:
+                # the correction needs a few designs at both levels first
+                promote = active
+            else:
+                threshold = self._threshold()
+                promote = [
+                    i for i in active if self.estimate(x[i], level - 1, y[i]) <= threshold
+                ]
+
+            print(f"fidelity {self.levels[level]}: promoting {len(promote)} of {len(active)}")
+            if not promote:
+                break
+
+            results = self._run(level, x[promote])
+            for i, yi in zip(promote, results):
+                if np.isfinite(yi):
+                    y[i] = yi
+            active = [i for i, yi in zip(promote, results) if np.isfinite(yi)]
+
+        # everything is reported to egor at the top fidelity
+        for i in range(len(x)):
+            if np.isfinite(y[i]):
+                _, level, yi = self.best[self._key(x[i])]
+                y[i] = self.estimate(x[i], level, yi)
+
+        return y.reshape(-1, 1)
 
-    for xi in x:
-        sim = SimulationManager(xi.tolist())
-        drag = sim.compute_drag()
-        results.append(drag)
 
-    return np.array(results).reshape(-1, 1)
+LADDER = FidelityLadder([Fidelity(CONFIG.mesh_refinement)])
+
+
+def evaluate_hypersonic_drag(x):
+    return LADDER.evaluate(x)
 
 
 def main():
@@ -194,11 +882,93 @@ def main():
         "--gpus",
         type=int,
         default=1,
+        help="the number of gpus (mpi ranks) used by each simulation",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="the number of simulations to run concurrently",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["cuda", "hip", "openmp"],
+        default="cuda",
+    )
+    parser.add_argument(
+        "--q-points",
+        type=int,
+        default=1,
+        help="the number of infill points egor proposes per iteration",
+    )
+    parser.add_argument(
+        "--cache-decimals",
+        type=int,
+        default=6,
+        help="designs whose dofs agree to this many decimals share a cached drag",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="always run the simulation, ignoring and not updating the drag cache",
+    )
+    parser.add_argument(
+        "--early-stop",
+        type=float,
+        default=None,
+        metavar="RTOL",
+        help="stop each run once its averaged cd has converged to this relative tolerance",
+    )
+    parser.add_argument(
+        "--warm-start",
+        action="store_true",
+        help="restart each run from the solution of the nearest design already evaluated",
+    )
+    parser.add_argument(
+        "--warm-transient",
+        type=float,
+        default=0.25,
+        help="time a warm-started run settles for before its drag is averaged",
+    )
+    parser.add_argument(
+        "--fidelities",
+        nargs="+",
+        default=["coarse"],
+        metavar="REFINEMENT[:ORDER[:TEND]]",
+        help="evaluation ladder from cheapest to most expensive, e.g. coarse:1:1.5 coarse medium",
+    )
+    parser.add_argument(
+        "--promote",
+        type=float,
+        default=0.25,
+        help="fraction of designs, by estimated drag, promoted to the next fidelity",
     )
     args = parser.parse_args()
 
-    global CONFIG
-    CONFIG = EnvConfig(args.env, args.gpus)
+    if args.warm_start and args.no_cache:
+        parser.error("--warm-start finds its donors through the cache, drop --no-cache")
+
+    global CONFIG, DEVICES, MESHER, CACHE, PARTITIONS, LADDER
+    CONFIG = EnvConfig(
+        args.env,
+        args.gpus,
+        args.workers,
+        args.backend,
+        cd_rtol=args.early_stop,
+        warm_start=args.warm_start,
+        warm_transient=args.warm_transient,
+    )
+    DEVICES = DevicePool(CONFIG)
+    MESHER = MeshWorkers(CONFIG.n_workers)
+    CACHE = DragCache(
+        os.path.join(CONFIG.working_dir, "drag-cache.sqlite"),
+        decimals=args.cache_decimals,
+        enabled=not args.no_cache,
+    )
+    PARTITIONS = partcache.PartitionCache(os.path.join(CONFIG.working_dir, "partition-cache"))
+    LADDER = FidelityLadder(
+        [Fidelity.parse(spec) for spec in args.fidelities], promote_frac=args.promote
+    )
 
     shape = args.shape if args.shape else CONFIG.default_shape
 
@@ -224,10 +994,14 @@ def main():
         trego=True,
         failsafe_strategy=egx.FailsafeStrategy.IMPUTATION,
         outdir=CONFIG.working_dir,
+        q_points=args.q_points,
         seed=42,
     )
 
-    res = egor.minimize(evaluate_hypersonic_drag, max_iters=30)
+    try:
+        res = egor.minimize(evaluate_hypersonic_drag, max_iters=30)
+    finally:
+        MESHER.shutdown()
 
     print(f"optimisation complete. minimum drag: {res.y_opt[0]}")
     print(f"optimal parameters: {res.x_opt}")
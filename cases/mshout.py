@@ -0,0 +1,131 @@
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+import gmsh
+
+# ascii msh 4.1, as pyfr's gmsh reader only takes text. MSH_BINARY=1 opts in
+# to binary, which writes far faster, for a pyfr or converter that reads it
+MSH_VERSION = 4.1
+MSH_BINARY = os.environ.get("MSH_BINARY", "0") != "0"
+
+FORMATS = {
+    "2.2-ascii": (2.2, False),
+    "4.1-ascii": (4.1, False),
+    "4.1-binary": (4.1, True),
+}
+
+
+def write(filename: str, binary: bool | None = None, version: float = MSH_VERSION):
+    # writes the current gmsh model, going through a temporary file in the
+    # same directory so a crash never leaves a truncated mesh behind
+    gmsh.option.setNumber("Mesh.MshFileVersion", version)
+    gmsh.option.setNumber("Mesh.Binary", int(MSH_BINARY if binary is None else binary))
+
+    root, ext = os.path.splitext(filename)
+    tmp = f"{root}.{os.getpid()}.tmp{ext}"
+    try:
+        gmsh.write(tmp)
+        os.replace(tmp, filename)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _box(nx: int, ny: int, layers: int):
+    # a transfinite quad rectangle, extruded into hexes if layers > 0, the
+    # same size as the inlet meshes
+    gmsh.model.add("bench")
+    geom = gmsh.model.geo
+
+    pts = [geom.addPoint(x, y, 0.0) for x, y in [(0, 0), (1, 0), (1, 0.36), (0, 0.36)]]
+    lines = [geom.addLine(pts[i], pts[(i + 1) % 4]) for i in range(4)]
+    surf = geom.addPlaneSurface([geom.addCurveLoop(lines)])
+
+    for line, n in zip(lines, [nx, ny, nx, ny]):
+        geom.mesh.setTransfiniteCurve(line, n + 1)
+    geom.mesh.setTransfiniteSurface(surf)
+    geom.mesh.setRecombine(2, surf)
+
+    if layers:
+        ext = geom.extrude([(2, surf)], 0, 0, 0.05, numElements=[layers], recombine=True)
+        geom.synchronize()
+        gmsh.model.addPhysicalGroup(3, [ext[1][1]], name="fluid")
+        gmsh.model.addPhysicalGroup(2, [surf, ext[0][1]], name="wall")
+    else:
+        geom.synchronize()
+        gmsh.model.addPhysicalGroup(2, [surf], name="fluid")
+        gmsh.model.addPhysicalGroup(1, lines, name="wall")
+
+    gmsh.model.mesh.generate(3 if layers else 2)
+
+
+def _pyfr_import(msh_file: str, workdir: str) -> str:
+    pyfrm = os.path.join(workdir, "bench.pyfrm")
+    start = time.perf_counter()
+    proc = subprocess.run(["pyfr", "import", msh_file, pyfrm], capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+
+    if os.path.exists(pyfrm):
+        os.remove(pyfrm)
+    if proc.returncode != 0:
+        return f"failed: {(proc.stderr.strip().splitlines() or ['?'])[-1]}"
+    return f"{elapsed:.2f} s"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="compares msh formats for write time, file size and pyfr import time"
+    )
+    parser.add_argument(
+        "mesh",
+        nargs="?",
+        help="an existing mesh to rewrite (default: a generated nx by ny rectangle)",
+    )
+    parser.add_argument("--nx", type=int, default=1024)
+    parser.add_argument("--ny", type=int, default=380)
+    parser.add_argument(
+        "--layers", type=int, default=0, help="extrude the rectangle into this many hex layers"
+    )
+    parser.add_argument(
+        "--formats", nargs="+", choices=list(FORMATS), default=list(FORMATS)
+    )
+    parser.add_argument(
+        "--no-import", action="store_true", help="skip timing pyfr import of each file"
+    )
+    args = parser.parse_args()
+
+    do_import = not args.no_import and shutil.which("pyfr") is not None
+
+    gmsh.initialize()
+    gmsh.option.setNumber("General.Terminal", 0)
+
+    try:
+        if args.mesh:
+            gmsh.open(args.mesh)
+        else:
+            _box(args.nx, args.ny, args.layers)
+
+        with tempfile.TemporaryDirectory(dir=".") as workdir:
+            print(f"{'format':<12} {'write':>9} {'size':>10}  import")
+            for name in args.formats:
+                version, binary = FORMATS[name]
+                msh_file = os.path.join(workdir, f"bench-{name}.msh")
+
+                start = time.perf_counter()
+                write(msh_file, binary=binary, version=version)
+                elapsed = time.perf_counter() - start
+
+                size = os.path.getsize(msh_file) / 2**20
+                imported = _pyfr_import(msh_file, workdir) if do_import else "skipped"
+                print(f"{name:<12} {elapsed:>7.2f} s {size:>7.1f} MiB  {imported}")
+                os.remove(msh_file)
+    finally:
+        gmsh.finalize()
+
+
+if __name__ == "__main__":
+    main()
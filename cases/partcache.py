@@ -0,0 +1,318 @@
+import argparse
+import fcntl
+import hashlib
+import json
+import math
+import os
+import shutil
+import subprocess
+
+import numpy as np
+
+CACHE_VERSION = 1
+CACHE_DIR = os.environ.get(
+    "PYFR_PARTITION_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "pyfr-partitions")
+)
+
+# the mesh datasets that say nothing about its elements: the uuid pyfr import
+# makes up afresh each time and any partitionings already added
+IGNORED = {"mesh-uuid", "mesh_uuid", "partitionings"}
+
+HASH_BLOCK = 64 * 1024 * 1024
+
+# the band of elements per rank choose_ranks aims for
+ELEMS_PER_RANK = (200_000, 2_500_000)
+
+
+def mesh_layout(filename: str) -> str:
+    # "2.x" meshes keep a node table and eles/{etype}, and are partitioned in
+    # place with pyfr partition add, whereas "1.x" ones keep spt_{etype}_p{n}
+    # and are partitioned into a new file
+    import h5py
+
+    with h5py.File(filename, "r") as f:
+        return "2.x" if "eles" in f else "1.x"
+
+
+def count_elements(filename: str, weights: dict[str, float] | None = None) -> float:
+    # the element count, or the weighted sum when weights are given, of the
+    # whole mesh however many parts it is already in
+    import h5py
+
+    weights = weights or {}
+    total = 0.0
+    with h5py.File(filename, "r") as f:
+        if "eles" in f:
+            for etype, ds in f["eles"].items():
+                total += len(ds) * weights.get(etype, 1)
+        else:
+            for key, ds in f.items():
+                if key.startswith("spt_"):
+                    total += ds.shape[1] * weights.get(key.split("_")[1], 1)
+
+    return total
+
+
+def choose_ranks(
+    nelems: float,
+    band: tuple[float, float] = ELEMS_PER_RANK,
+    max_ranks: int = 8,
+) -> int:
+    # as many ranks as still leaves each with the bottom of the band, for the
+    # turnaround, but never so few that any is over the top of it, all within
+    # max_ranks
+    lo, hi = band
+    fewest = math.ceil(nelems / hi)
+    most = int(nelems // lo)
+    return max(1, min(max_ranks, max(fewest, most)))
+
+
+def mesh_hash(filename: str, memo_dir: str | None = None) -> str:
+    # a hash of the mesh's elements rather than of the file, as the uuid and
+    # the hdf5 layout change with every pyfr import of the same mesh. it is
+    # remembered against the file's identity, as the big meshes take a while
+    import h5py
+
+    st = os.stat(filename)
+    memo = None
+    if memo_dir is not None:
+        ident = f"{st.st_dev}-{st.st_ino}-{st.st_size}-{st.st_mtime_ns}"
+        memo = os.path.join(memo_dir, "hashes", ident)
+        if os.path.exists(memo):
+            with open(memo) as f:
+                return f.read().strip()
+
+    h = hashlib.sha256()
+
+    def visit(name, obj):
+        if set(name.split("/")) & IGNORED:
+            return
+
+        h.update(name.encode())
+        for key in sorted(obj.attrs):
+            h.update(f"{key}={obj.attrs[key]!r}".encode())
+
+        if isinstance(obj, h5py.Dataset):
+            h.update(f"{obj.dtype.str}{obj.shape}".encode())
+            if obj.ndim == 0:
+                h.update(np.asarray(obj[()]).tobytes())
+                return
+
+            # blocks along the longest axis, so even the spt arrays, which
+            # are only a handful of nodes deep, are read a slab at a time
+            axis = max(range(obj.ndim), key=lambda i: obj.shape[i])
+            row = obj.dtype.itemsize * obj.size // max(obj.shape[axis], 1)
+            step = max(1, HASH_BLOCK // max(row, 1))
+            for start in range(0, obj.shape[axis], step):
+                idx = [slice(None)] * obj.ndim
+                idx[axis] = slice(start, start + step)
+                h.update(obj[tuple(idx)].tobytes())
+
+    with h5py.File(filename, "r") as f:
+        f.visititems(visit)
+
+    digest = h.hexdigest()
+    if memo is not None:
+        os.makedirs(os.path.dirname(memo), exist_ok=True)
+        tmp = f"{memo}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(digest)
+        os.replace(tmp, memo)
+
+    return digest
+
+
+def pyfr_version() -> str:
+    try:
+        proc = subprocess.run(["pyfr", "--version"], capture_output=True, text=True, timeout=60)
+        return proc.stdout.strip() or "unknown"
+    except (OSError, subprocess.TimeoutExpired):
+        return "unknown"
+
+
+def weight_args(weights: dict[str, float] | None) -> list[str]:
+    args = []
+    for etype, weight in sorted((weights or {}).items()):
+        args += ["-e", f"{etype}:{weight:g}"]
+    return args
+
+
+class PartitionCache:
+    # partitioned meshes stored under a hash of everything that decides the
+    # partitioning: the mesh's elements, the rank count, the partitioner, the
+    # element weights and the pyfr doing it, so changing any of them can never
+    # pick up a stale partition the way checking for the file used to
+    def __init__(self, root: str = CACHE_DIR, enabled: bool = True):
+        self.root = root
+        self.enabled = enabled
+        self._version = None
+
+    def key(
+        self, mesh: str, nparts: int, partitioner: str, weights: dict[str, float] | None
+    ) -> str:
+        if self._version is None:
+            self._version = pyfr_version()
+
+        record = {
+            "mesh": mesh_hash(mesh, self.root),
+            "nparts": nparts,
+            "partitioner": partitioner,
+            "weights": weights or {},
+            "pyfr": self._version,
+            "cache_version": CACHE_VERSION,
+        }
+        return hashlib.sha256(json.dumps(record, sort_keys=True).encode()).hexdigest()
+
+    def entry(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def get(
+        self,
+        mesh: str,
+        filename: str,
+        nparts: int,
+        partitioner: str = "scotch",
+        weights: dict[str, float] | None = None,
+    ) -> bool:
+        # puts mesh, split nparts ways, at filename (which may be mesh
+        # itself), returning whether it had to be partitioned
+        if nparts <= 1:
+            if os.path.abspath(mesh) != os.path.abspath(filename):
+                _copy(mesh, filename)
+            return False
+
+        if not self.enabled:
+            _partition(mesh, filename, nparts, partitioner, weights)
+            return True
+
+        os.makedirs(self.root, exist_ok=True)
+        entry = self.entry(self.key(mesh, nparts, partitioner, weights))
+        os.makedirs(entry, exist_ok=True)
+        cached = os.path.join(entry, "mesh.pyfrm")
+
+        # concurrent setups of the same partitioning wait for the first
+        with open(os.path.join(entry, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+
+            built = not os.path.exists(cached)
+            if built:
+                _partition(mesh, cached, nparts, partitioner, weights)
+                with open(os.path.join(entry, "params.json"), "w") as f:
+                    record = {"mesh": os.path.abspath(mesh), "nparts": nparts}
+                    json.dump(
+                        {**record, "partitioner": partitioner, "weights": weights or {}},
+                        f,
+                        indent=2,
+                    )
+
+        _copy(cached, filename)
+        return built
+
+
+def _partition(
+    mesh: str, filename: str, nparts: int, partitioner: str, weights: dict[str, float] | None
+):
+    root, ext = os.path.splitext(filename)
+    tmp = f"{root}.{os.getpid()}.tmp{ext}"
+    opts = ["-p", partitioner] + weight_args(weights)
+
+    try:
+        if mesh_layout(mesh) == "2.x":
+            shutil.copyfile(mesh, tmp)
+            subprocess.run(["pyfr", "partition", "add", "-f", *opts, tmp, str(nparts)], check=True)
+        else:
+            # 1.x writes the partitioned mesh under the input's name into a
+            # directory, so it gets one of its own
+            tmpdir = f"{tmp}.d"
+            os.makedirs(tmpdir, exist_ok=True)
+            try:
+                subprocess.run(
+                    ["pyfr", "partition", *opts, str(nparts), mesh, tmpdir], check=True
+                )
+                os.replace(os.path.join(tmpdir, os.path.basename(mesh)), tmp)
+            finally:
+                shutil.rmtree(tmpdir, ignore_errors=True)
+
+        os.replace(tmp, filename)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _copy(src: str, dst: str):
+    # a copy rather than a hard link, as pyfr partition add rewrites a mesh
+    # in place, which through a link would corrupt the cache. it keeps the
+    # cached mtime, so a requeued job finding the same copy already there
+    # does not copy a large mesh again
+    src_st = os.stat(src)
+    if os.path.exists(dst):
+        dst_st = os.stat(dst)
+        if (dst_st.st_size, dst_st.st_mtime_ns) == (src_st.st_size, src_st.st_mtime_ns):
+            return
+
+    tmp = f"{dst}.{os.getpid()}.tmp"
+    try:
+        shutil.copy2(src, tmp)
+        os.replace(tmp, dst)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def parse_weights(specs: list[str] | None) -> dict[str, float]:
+    # etype:weight, as pyfr partition -e takes them
+    weights = {}
+    for spec in specs or []:
+        etype, _, weight = spec.partition(":")
+        weights[etype] = float(weight)
+    return weights
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="partitions a pyfr mesh through a cache keyed on the mesh, rank count, "
+        "partitioner and element weights"
+    )
+    parser.add_argument("mesh")
+    parser.add_argument(
+        "nparts", nargs="?", default="auto", help="the rank count, or auto to pick one"
+    )
+    parser.add_argument(
+        "-o", "--output", help="where to put the partitioned mesh (default: in place)"
+    )
+    parser.add_argument("-p", "--partitioner", default="scotch")
+    parser.add_argument("-e", "--elewts", action="append", metavar="ETYPE:WEIGHT")
+    parser.add_argument(
+        "--band",
+        type=float,
+        nargs=2,
+        default=ELEMS_PER_RANK,
+        metavar=("LO", "HI"),
+        help="the elements per rank auto aims for",
+    )
+    parser.add_argument("--max-ranks", type=int, default=8)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument(
+        "--print-ranks", action="store_true", help="only print the rank count auto would pick"
+    )
+    args = parser.parse_args()
+
+    weights = parse_weights(args.elewts)
+    if args.nparts == "auto":
+        nelems = count_elements(args.mesh, weights)
+        nparts = choose_ranks(nelems, tuple(args.band), args.max_ranks)
+    else:
+        nparts = int(args.nparts)
+
+    if args.print_ranks:
+        print(nparts)
+        return
+
+    cache = PartitionCache(args.cache_dir, enabled=not args.no_cache)
+    built = cache.get(args.mesh, args.output or args.mesh, nparts, args.partitioner, weights)
+    print(f"{args.output or args.mesh}: {nparts} part(s), {'partitioned' if built else 'cached'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+import argparse
+import json
+import os
+import sys
+from math import sqrt
+
+import numpy as np
+
+import flow
+
+# corners of the linear element in pyfr's node order, which is tensor
+# product order for quads, hexes and the base of pyramids
+NCORNERS = {"tri": 3, "quad": 4, "tet": 4, "pri": 6, "pyr": 5, "hex": 8}
+
+EDGES = {
+    "tri": [(0, 1), (1, 2), (2, 0)],
+    "quad": [(0, 1), (2, 3), (0, 2), (1, 3)],
+    "tet": [(0, 1), (0, 2), (0, 3), (1, 2), (1, 3), (2, 3)],
+    "pri": [(0, 1), (1, 2), (2, 0), (3, 4), (4, 5), (5, 3), (0, 3), (1, 4), (2, 5)],
+    "pyr": [(0, 1), (2, 3), (0, 2), (1, 3), (0, 4), (1, 4), (2, 4), (3, 4)],
+    "hex": [
+        (0, 1), (2, 3), (4, 5), (6, 7),
+        (0, 2), (1, 3), (4, 6), (5, 7),
+        (0, 4), (1, 5), (2, 6), (3, 7),
+    ],
+}
+
+# gmsh names and its corner order relative to pyfr's
+GMSH_TYPES = {
+    "Triangle": ("tri", [0, 1, 2]),
+    "Quadrilateral": ("quad", [0, 1, 3, 2]),
+    "Tetrahedron": ("tet", [0, 1, 2, 3]),
+    "Prism": ("pri", [0, 1, 2, 3, 4, 5]),
+    "Pyramid": ("pyr", [0, 1, 3, 2, 4]),
+    "Hexahedron": ("hex", [0, 1, 3, 2, 4, 5, 7, 6]),
+}
+
+CHUNK_ELEMS = 1 << 20
+
+
+def _det(*vecs: np.ndarray) -> np.ndarray:
+    return np.linalg.det(np.stack(vecs, axis=-1))
+
+
+def scaled_jacobian(etype: str, x: np.ndarray) -> np.ndarray | None:
+    # the smallest corner scaled jacobian of each element of x, an (neles,
+    # ncorners, ndims) array, normalised so an ideal element scores 1
+    ndims = x.shape[2]
+
+    if etype in {"quad", "hex"}:
+        sj = []
+        for m in range(NCORNERS[etype]):
+            edges = []
+            for a in range(ndims):
+                sign = 1.0 - 2.0 * ((m >> a) & 1)
+                edges.append(sign * (x[:, m ^ (1 << a)] - x[:, m]))
+            lengths = np.prod([np.linalg.norm(e, axis=1) for e in edges], axis=0)
+            sj.append(_det(*edges) / lengths)
+        return np.min(sj, axis=0)
+
+    if etype in {"tri", "tet"}:
+        n = ndims + 1
+        det = _det(*[x[:, i] - x[:, 0] for i in range(1, n)])
+        ideal = 2.0 / sqrt(3.0) if etype == "tri" else sqrt(2.0)
+
+        sj = []
+        for c in range(n):
+            lengths = np.prod(
+                [np.linalg.norm(x[:, i] - x[:, c], axis=1) for i in range(n) if i != c], axis=0
+            )
+            sj.append(ideal * det / lengths)
+        return np.min(sj, axis=0)
+
+    if etype == "pri":
+        sj = []
+        for c in range(3):
+            for base in [0, 3]:
+                e1 = x[:, base + (c + 1) % 3] - x[:, base + c]
+                e2 = x[:, base + (c + 2) % 3] - x[:, base + c]
+                e3 = x[:, c + 3] - x[:, c]
+                lengths = np.prod([np.linalg.norm(e, axis=1) for e in [e1, e2, e3]], axis=0)
+                sj.append(2.0 / sqrt(3.0) * _det(e1, e2, e3) / lengths)
+        return np.min(sj, axis=0)
+
+    # pyramids have no single corner measure worth trusting
+    return None
+
+
+def min_edge(etype: str, x: np.ndarray) -> np.ndarray:
+    return np.min([np.linalg.norm(x[:, j] - x[:, i], axis=1) for i, j in EDGES[etype]], axis=0)
+
+
+def _tensor_corners(etype: str, nnodes: int) -> list[int]:
+    # corner indices of a curved element, whose nodes pyfr orders as a
+    # tensor product lattice for quads and hexes and row by row for tris
+    if etype == "quad":
+        n = round(sqrt(nnodes))
+        return [0, n - 1, n * (n - 1), n * n - 1]
+    if etype == "hex":
+        n = round(nnodes ** (1 / 3))
+        return [i + n * j + n * n * k for k in [0, n - 1] for j in [0, n - 1] for i in [0, n - 1]]
+    if etype == "tri":
+        n = round((sqrt(8 * nnodes + 1) - 1) / 2)
+        return [0, n - 1, nnodes - 1]
+
+    raise ValueError(f"cannot find the corners of a curved {etype}")
+
+
+def read_pyfrm(filename: str):
+    # yields (etype, corners) in chunks, for both the 1.x layout of
+    # spt_{etype}_p{n} arrays and the 2.x one of a node table indexed by
+    # eles/{etype}
+    import h5py
+
+    with h5py.File(filename, "r") as f:
+        if "eles" in f:
+            nodes = f["nodes"]
+            locs = nodes["location"] if nodes.dtype.names else nodes[()]
+
+            for etype, ds in f["eles"].items():
+                for start in range(0, len(ds), CHUNK_ELEMS):
+                    idx = ds.fields("nodes")[start : start + CHUNK_ELEMS]
+                    if idx.shape[1] != NCORNERS[etype]:
+                        idx = idx[:, _tensor_corners(etype, idx.shape[1])]
+                    yield etype, locs[idx]
+        else:
+            for key in sorted(f):
+                if not key.startswith("spt_"):
+                    continue
+
+                etype = key.split("_")[1]
+                ds = f[key]
+                nnodes, neles, _ = ds.shape
+                corners = (
+                    list(range(nnodes))
+                    if nnodes == NCORNERS[etype]
+                    else _tensor_corners(etype, nnodes)
+                )
+
+                for start in range(0, neles, CHUNK_ELEMS):
+                    spts = ds[:, start : start + CHUNK_ELEMS]
+                    yield etype, spts[corners].swapaxes(0, 1)
+
+
+def read_msh(filename: str):
+    import gmsh
+
+    gmsh.initialize()
+    gmsh.option.setNumber("General.Terminal", 0)
+    try:
+        gmsh.open(filename)
+        ndims = gmsh.model.getDimension()
+
+        node_tags, coords, _ = gmsh.model.mesh.getNodes()
+        coords = coords.reshape(-1, 3)[:, :ndims]
+        index = np.zeros(int(node_tags.max()) + 1, dtype=np.int64)
+        index[node_tags.astype(np.int64)] = np.arange(len(node_tags))
+
+        for gtype in gmsh.model.mesh.getElementTypes(dim=ndims):
+            name, _, _, nnodes, _, nverts = gmsh.model.mesh.getElementProperties(gtype)
+            etype, perm = GMSH_TYPES[name.split()[0]]
+
+            _, enodes = gmsh.model.mesh.getElementsByType(gtype)
+            enodes = enodes.reshape(-1, nnodes)[:, :nverts][:, perm]
+            for start in range(0, len(enodes), CHUNK_ELEMS):
+                yield etype, coords[index[enodes[start : start + CHUNK_ELEMS]]]
+    finally:
+        gmsh.finalize()
+
+
+def analyse(filename: str) -> dict:
+    reader = read_pyfrm if filename.endswith(".pyfrm") else read_msh
+
+    counts = {}
+    sj_min, sj_max = np.inf, -np.inf
+    inverted = 0
+    h_min, h_max = np.inf, 0.0
+    ndims = None
+
+    for etype, x in reader(filename):
+        ndims = x.shape[2]
+        counts[etype] = counts.get(etype, 0) + len(x)
+
+        sj = scaled_jacobian(etype, x)
+        if sj is not None:
+            sj_min = min(sj_min, sj.min())
+            sj_max = max(sj_max, sj.max())
+            inverted += int(np.count_nonzero(sj <= 0.0))
+
+        h = min_edge(etype, x)
+        h_min = min(h_min, h.min())
+        h_max = max(h_max, h.max())
+
+    if not counts:
+        raise ValueError(f"no elements found in {filename}")
+
+    return {
+        "mesh": os.path.abspath(filename),
+        "ndims": ndims,
+        "elements": counts,
+        "total_elements": sum(counts.values()),
+        "scaled_jacobian": {
+            "min": float(sj_min) if np.isfinite(sj_min) else None,
+            "max": float(sj_max) if np.isfinite(sj_max) else None,
+        },
+        "inverted": inverted,
+        "min_length": float(h_min),
+        "max_element_length": float(h_max),
+    }
+
+
+def estimate(
+    report: dict,
+    order: int,
+    mach: float,
+    reynolds: float,
+    cfl: float = 0.5,
+    gpus: int = 1,
+    precision: str = "double",
+    scheme: str = "rk4",
+) -> dict:
+    ndims = report["ndims"]
+    nvars = ndims + 2
+    dofs = nvars * sum(
+        n * flow.SOLUTION_POINTS[etype](order) for etype, n in report["elements"].items()
+    )
+    memory = flow.memory_estimate(dofs, ndims, precision, scheme)
+    dt, limit = flow.stable_dt(report["min_length"], order, mach, reynolds, cfl)
+
+    return {
+        "order": order,
+        "mach": mach,
+        "reynolds": reynolds,
+        "cfl": cfl,
+        "precision": precision,
+        "scheme": scheme,
+        "dofs": dofs,
+        "gpus": gpus,
+        "memory_per_gpu_gib": memory / gpus / 2**30,
+        "stable_dt": dt,
+        "dt_limit": limit,
+    }
+
+
+def check(
+    report: dict, min_jacobian: float, gpu_memory: float, ini_dt: float | None
+) -> tuple[list[str], list[str]]:
+    # everything that would sink a job, empty if it is fine to submit, and
+    # the things worth a second look
+    problems = []
+    warnings = []
+
+    if report["inverted"]:
+        problems.append(f"{report['inverted']} inverted elements")
+
+    sj = report["scaled_jacobian"]["min"]
+    if sj is not None and sj < min_jacobian:
+        problems.append(f"minimum scaled jacobian {sj:.3g} below {min_jacobian}")
+
+    if report["memory_per_gpu_gib"] > gpu_memory:
+        problems.append(
+            f"an estimated {report['memory_per_gpu_gib']:.1f} GiB per gpu, above {gpu_memory} GiB"
+        )
+
+    # the estimate puts freestream speed through the smallest wall cell, so
+    # it errs small and is only a warning unless asked otherwise
+    if ini_dt is not None and ini_dt > report["stable_dt"]:
+        warnings.append(
+            f"dt {ini_dt:g} in the case file above the estimated stable {report['stable_dt']:.3g}"
+        )
+
+    return problems, warnings
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="checks a mesh's quality and estimates the cost and stable dt of running it, "
+        "exiting non-zero if the job would not be worth submitting"
+    )
+    parser.add_argument("mesh", help="a .msh or .pyfrm file")
+    parser.add_argument("--ini", help="the case file to take order, Re, Mach, dt and precision from")
+    parser.add_argument("--order", type=int)
+    parser.add_argument("--mach", type=float)
+    parser.add_argument("--reynolds", type=float)
+    parser.add_argument("--precision", choices=["single", "double"])
+    parser.add_argument("--cfl", type=float, default=0.5)
+    parser.add_argument("-g", "--gpus", type=int, default=1)
+    parser.add_argument(
+        "--gpu-memory", type=float, default=80.0, help="memory of each gpu in GiB"
+    )
+    parser.add_argument("--min-jacobian", type=float, default=0.05)
+    parser.add_argument("--strict", action="store_true", help="fail on warnings too")
+    parser.add_argument("-o", "--output", help="the json report (default: beside the mesh)")
+    args = parser.parse_args()
+
+    params = {"order": None, "mach": None, "reynolds": None}
+    precision, scheme, ini_dt = "double", "rk4", None
+
+    if args.ini:
+        try:
+            cfg = flow.read_ini(args.ini)
+        except FileNotFoundError:
+            parser.error(f"cannot read {args.ini}")
+
+        params.update(flow.freestream(cfg))
+        precision = cfg.get("backend", "precision", fallback=precision)
+        scheme = cfg.get("solver-time-integrator", "scheme", fallback=scheme)
+        if cfg.get("solver-time-integrator", "controller", fallback="none") == "none":
+            ini_dt = flow.ini_number(cfg, "solver-time-integrator", "dt")
+
+    for key in params:
+        if getattr(args, key) is not None:
+            params[key] = getattr(args, key)
+    if args.precision:
+        precision = args.precision
+
+    missing = [key for key, value in params.items() if value is None]
+    if missing:
+        parser.error(f"give --ini or all of --order, --mach and --reynolds (missing {missing})")
+
+    report = analyse(args.mesh)
+    report.update(
+        estimate(
+            report,
+            params["order"],
+            params["mach"],
+            params["reynolds"],
+            args.cfl,
+            args.gpus,
+            precision,
+            scheme,
+        )
+    )
+    report["ini_dt"] = ini_dt
+    report["problems"], report["warnings"] = check(
+        report, args.min_jacobian, args.gpu_memory, ini_dt
+    )
+    if args.strict:
+        report["problems"] += report["warnings"]
+    report["ok"] = not report["problems"]
+
+    output = args.output or os.path.splitext(args.mesh)[0] + ".preflight.json"
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    sj = report["scaled_jacobian"]
+    print(
+        f"{report['total_elements']} elements {report['elements']}, scaled jacobian "
+        f"{sj['min']} to {sj['max']}, smallest length {report['min_length']:.3e}"
+    )
+    print(
+        f"order {report['order']}: {report['dofs']:.3e} dofs, "
+        f"~{report['memory_per_gpu_gib']:.2f} GiB on each of {args.gpus} gpus, "
+        f"stable dt ~{report['stable_dt']:.3e} ({report['dt_limit']})"
+    )
+    for w in report["warnings"]:
+        print(f"warning: {w}")
+    for p in report["problems"]:
+        print(p)
+    print(f"{'ok' if report['ok'] else 'not ok'}, report in {output}")
+
+    sys.exit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
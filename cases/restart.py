@@ -0,0 +1,172 @@
+import argparse
+import configparser
+import glob
+import os
+import re
+import subprocess
+import sys
+
+import csvtail
+import flow
+
+# how much of a solution dataset is read at a time when checking it
+CHECK_BLOCK = 64 * 1024 * 1024
+
+
+def solution_pattern(cfg: configparser.ConfigParser, run_dir: str) -> str:
+    # the glob soln-plugin-writer's files match, with the {t:...} of its
+    # basename as a wildcard
+    section = "soln-plugin-writer"
+    basedir = cfg.get(section, "basedir", fallback=".")
+    basename = re.sub(r"\{[^}]*\}", "*", cfg.get(section, "basename"))
+    return os.path.join(run_dir, basedir, f"{basename}.pyfrs")
+
+
+def plugin_csvs(cfg: configparser.ConfigParser, run_dir: str) -> list[str]:
+    # every csv a plugin appends to, which all need trimming back together
+    files = []
+    for section in cfg.sections():
+        if section.startswith("soln-plugin-") and cfg.has_option(section, "file"):
+            name = cfg.get(section, "file").split("#")[0].split(";")[0].strip()
+            if name.endswith(".csv"):
+                files.append(os.path.join(run_dir, name))
+
+    return files
+
+
+def mesh_uuid(filename: str) -> bytes:
+    import h5py
+
+    with h5py.File(filename, "r") as f:
+        return f["mesh-uuid" if "mesh-uuid" in f else "mesh_uuid"][()]
+
+
+def check_solution(filename: str) -> tuple[float, bytes] | None:
+    # the time and mesh uuid of a solution if it is whole, or None if the
+    # writer was killed partway through it. every dataset is read through,
+    # as a truncated file often still opens
+    import h5py
+
+    try:
+        with h5py.File(filename, "r") as f:
+            uuid = f["mesh-uuid" if "mesh-uuid" in f else "mesh_uuid"][()]
+
+            stats = configparser.ConfigParser(inline_comment_prefixes=("#", ";"))
+            stats.read_string(f["stats"][()].decode())
+            tcurr = stats.getfloat("solver-time-integrator", "tcurr")
+
+            datasets = []
+            f.visititems(
+                lambda name, obj: datasets.append(obj) if isinstance(obj, h5py.Dataset) else None
+            )
+            for ds in datasets:
+                if ds.ndim == 0 or ds.size == 0:
+                    ds[()]
+                    continue
+
+                step = max(1, CHECK_BLOCK // max(1, ds.dtype.itemsize * ds.size // ds.shape[0]))
+                for start in range(0, ds.shape[0], step):
+                    ds[start : start + step]
+    except (OSError, KeyError, ValueError, configparser.Error):
+        return None
+
+    return tcurr, uuid
+
+
+def latest_checkpoint(
+    run_dir: str, cfg: configparser.ConfigParser, mesh: str, set_aside: bool = True
+) -> tuple[str, float] | None:
+    # the most recently written intact solution of this run on this mesh.
+    # any written since that are incomplete are renamed out of the way, so
+    # neither pyfr nor the analysis scripts pick them up
+    uuid = mesh_uuid(mesh)
+
+    candidates = []
+    for soln in glob.glob(solution_pattern(cfg, run_dir)):
+        candidates.append((os.path.getmtime(soln), soln))
+
+    for _, soln in sorted(candidates, reverse=True):
+        checked = check_solution(soln)
+        if checked is None:
+            print(f"{soln} is incomplete")
+            if set_aside:
+                os.replace(soln, f"{soln}.bad")
+        elif checked[1] != uuid:
+            print(f"{soln} is for another mesh, skipping it")
+        else:
+            return soln, checked[0]
+
+    return None
+
+
+def prepare(
+    run_dir: str, mesh: str, ini: str, nranks: int = 1, backend: str = "cuda"
+) -> tuple[list[str] | None, float | None]:
+    # the command that carries a run on from its latest intact checkpoint,
+    # with the plugin csvs trimmed back to it, or that starts it afresh when
+    # there is none, together with the time it restarts from. the command is
+    # None when the run already reached tend
+    cfg = flow.read_ini(ini)
+    csvs = plugin_csvs(cfg, run_dir)
+    launcher = ["mpiexec", "-n", str(nranks)]
+
+    checkpoint = latest_checkpoint(run_dir, cfg, mesh)
+    if checkpoint is None:
+        # whatever the plugins wrote before the first checkpoint is redone
+        for filename in csvs:
+            csvtail.remove(filename)
+
+        os.makedirs(os.path.dirname(solution_pattern(cfg, run_dir)), exist_ok=True)
+        return launcher + ["pyfr", "run", "-b", backend, mesh, ini], None
+
+    soln, tcurr = checkpoint
+    tend = flow.ini_number(cfg, "solver-time-integrator", "tend")
+    if tcurr >= tend - 1e-9 * max(1.0, abs(tend)):
+        return None, tcurr
+
+    for filename in csvs:
+        dropped = csvtail.trim(filename, tcurr)
+        if dropped:
+            print(f"trimmed {dropped} row(s) past t = {tcurr:g} from {filename}")
+
+    return launcher + ["pyfr", "restart", "-b", backend, mesh, soln, ini], tcurr
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="runs a pyfr case, or restarts it from its latest intact checkpoint after "
+        "trimming the plugin csvs back to it, so a preempted job can simply be resubmitted"
+    )
+    parser.add_argument("run_dir", nargs="?", default=".")
+    parser.add_argument("--mesh", required=True)
+    parser.add_argument("--ini", required=True)
+    parser.add_argument("-n", "--ranks", type=int, default=1)
+    parser.add_argument("-b", "--backend", default="cuda")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="only report the checkpoint that would be used"
+    )
+    args = parser.parse_args()
+
+    run_dir = os.path.abspath(args.run_dir)
+    mesh = os.path.join(run_dir, args.mesh)
+    ini = os.path.join(run_dir, args.ini)
+
+    if args.dry_run:
+        checkpoint = latest_checkpoint(run_dir, flow.read_ini(ini), mesh, set_aside=False)
+        if checkpoint is None:
+            print("no checkpoint, the run would start from scratch")
+        else:
+            print(f"would restart from {checkpoint[0]} at t = {checkpoint[1]:g}")
+        return
+
+    cmd, tcurr = prepare(run_dir, mesh, ini, args.ranks, args.backend)
+    if cmd is None:
+        print(f"{run_dir} already reached tend (t = {tcurr:g})")
+        return
+
+    print(f"restarting from t = {tcurr:g}" if tcurr is not None else "starting from scratch")
+    sys.exit(subprocess.run(cmd, cwd=run_dir).returncode)
+
+
+if __name__ == "__main__":
+    main()
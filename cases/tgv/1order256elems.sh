@@ -1,31 +1,11 @@
 #!/bin/bash
-#SBATCH --job-name=tgv-1order265elem
-#SBATCH --partition=interruptible_gpu
-#SBATCH --nodes=1
-#SBATCH --ntasks=8
-#SBATCH --cpus-per-task=8
-#SBATCH --mem=256G
-#SBATCH --gres=gpu:8
-#SBATCH --time=24:00:00
-#SBATCH --output=tgv-1order265elem-%j.log
-#SBATCH --error=tgv-1order265elem-%j.err
-#SBATCH --constraint=l40s
+# submits the order 1, 256 element tgv case with entropy-filter, see sweep.py
 
 source $HOME/pyfr/.venv/bin/activate
-source $HOME/pyfr/initenv.sh
 
-MESHFILE="$HOME/pyfr/cases/tgv/256-elems-tgv-mesh.pyfrm"
-SCRATCH_DIR="/scratch/users/k24108571/tgv-results/entropy-filter/order1-elems256"
-PARTITIONED_MESHFILE="${SCRATCH_DIR}/256-elems-tgv-mesh-partitioned.pyfrm"
-INIFILE="${SCRATCH_DIR}/tgv-ord1-elems256.ini"
-
-cd "${SCRATCH_DIR}"
-
-if [ ! -f "${PARTITIONED_MESHFILE}" ]; then 
-    echo "partitioning mesh file"
-    cp "${MESHFILE}" "${PARTITIONED_MESHFILE}"
-    pyfr partition -p scotch 8 "${PARTITIONED_MESHFILE}" .
-fi 
-
-echo "launching pyfr"
-mpiexec -n 8 pyfr run -b cuda "${PARTITIONED_MESHFILE}" "${INIFILE}"
\ No newline at end of file
+python $HOME/pyfr/cases/tgv/sweep.py slurm \
+    -o /scratch/users/k24108571/tgv-results \
+    --sweep 1:256@8 \
+    --shock-capturing entropy-filter \
+    --constraint l40s --cpus-per-task 8 --mem 256G \
+    "$@"
@@ -0,0 +1,284 @@
+import argparse
+import configparser
+import csv
+import glob
+import json
+import os
+import re
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import csvtail
+
+CASE_RE = re.compile(r"order(\d+)-elems(\d+)")
+PARTITION_RE = re.compile(r"(?:^|[_/])p(\d+)(?:$|/)")
+
+T_END = 20.0
+
+COLUMNS = [
+    "case", "order", "elems", "dofs", "gpus", "wall_hours", "gpu_hours", "t_end",
+    "l2", "linf", "t_peak", "t_peak_error", "eps_peak_error", "numerical_fraction",
+    "reference",
+]
+
+
+def smooth_derivative(t: np.ndarray, y: np.ndarray, half_width: float) -> np.ndarray:
+    # dy/dt from a local quadratic least-squares fit over t +- half_width,
+    # which unlike differencing does not amplify the noise in y and copes
+    # with the uneven spacing left by restarts
+    dydt = np.empty_like(y)
+    for i, ti in enumerate(t):
+        near = np.abs(t - ti) <= half_width
+        if near.sum() < 3:
+            near = np.argsort(np.abs(t - ti))[:3]
+
+        dt = t[near] - ti
+        coeffs = np.polyfit(dt, y[near], 2)
+        dydt[i] = coeffs[1]
+
+    return dydt
+
+
+def peak(t: np.ndarray, y: np.ndarray) -> tuple[float, float]:
+    # the maximum of y, refined by a parabola through its neighbours
+    i = int(np.argmax(y))
+    if i == 0 or i == len(y) - 1:
+        return float(t[i]), float(y[i])
+
+    coeffs = np.polyfit(t[i - 1 : i + 2], y[i - 1 : i + 2], 2)
+    if coeffs[0] >= 0:
+        return float(t[i]), float(y[i])
+
+    tp = -coeffs[1] / (2 * coeffs[0])
+    return float(tp), float(np.polyval(coeffs, tp))
+
+
+def dissipation(filename: str, half_width: float, volume: float = 1.0) -> dict:
+    data = csvtail.read(filename)
+    t = data["t"]
+    ek = data["int-Ek"] / volume
+
+    # a restart may have rewritten some rows, in which case the later ones win
+    t, idx = np.unique(t[::-1], return_index=True)
+    idx = len(data) - 1 - idx
+    ek = ek[idx]
+
+    eps = -smooth_derivative(t, ek, half_width)
+    resolved = np.zeros_like(eps)
+    for name in ["int-eps_s", "int-eps_d"]:
+        if name in data:
+            resolved += data[name][idx] / volume
+
+    return {"t": t, "eps": eps, "resolved": resolved}
+
+
+def read_reference(filename: str, half_width: float) -> dict:
+    # a csv with a t column and either the dissipation rate, as eps or
+    # -dEk/dt, or the kinetic energy, as Ek or int-Ek
+    data = csvtail.read(filename, sidecar=False)
+    for name in ["eps", "-dEk/dt"]:
+        if name in data:
+            return {"t": data["t"], "eps": data[name]}
+    for name in ["int-Ek", "Ek"]:
+        if name in data:
+            return {"t": data["t"], "eps": -smooth_derivative(data["t"], data[name], half_width)}
+
+    raise ValueError(f"{filename} has none of eps, -dEk/dt, Ek or int-Ek")
+
+
+def errors(run: dict, ref: dict) -> dict:
+    t0 = max(run["t"][0], ref["t"][0])
+    t1 = min(run["t"][-1], ref["t"][-1])
+    grid = np.linspace(t0, t1, 1000)
+
+    eps = np.interp(grid, run["t"], run["eps"])
+    eps_ref = np.interp(grid, ref["t"], ref["eps"])
+    diff = eps - eps_ref
+
+    t_peak, eps_peak = peak(run["t"], run["eps"])
+    t_peak_ref, eps_peak_ref = peak(ref["t"], ref["eps"])
+
+    return {
+        "l2": float(np.sqrt(np.mean(diff**2) / np.mean(eps_ref**2))),
+        "linf": float(np.max(np.abs(diff)) / np.max(np.abs(eps_ref))),
+        "t_peak": t_peak,
+        "t_peak_error": t_peak - t_peak_ref,
+        "eps_peak_error": (eps_peak - eps_peak_ref) / eps_peak_ref,
+    }
+
+
+def latest_solution(case_dir: str) -> str | None:
+    solns = glob.glob(os.path.join(case_dir, "out", "*.pyfrs"))
+    return max(solns, key=os.path.getmtime) if solns else None
+
+
+def cost(case_dir: str) -> dict:
+    # the wall clock and gpu count, from job.json when the sweep wrote one
+    # and otherwise from the stats and partitions of the latest solution
+    job_file = os.path.join(case_dir, "job.json")
+    if os.path.exists(job_file):
+        with open(job_file) as f:
+            job = json.load(f)
+        if job.get("wall_time") is not None:
+            return {"gpus": job.get("gpus", 1), "wall_time": job["wall_time"]}
+
+    soln = latest_solution(case_dir)
+    if soln is None:
+        return {"gpus": None, "wall_time": None}
+
+    import h5py
+
+    with h5py.File(soln, "r") as f:
+        stats = configparser.ConfigParser()
+        stats.read_string(f["stats"][()].decode())
+
+        parts = set()
+        f.visit(lambda name: parts.update(PARTITION_RE.findall(name)))
+
+    wall_time = stats.getfloat("solver-time-integrator", "wall-time", fallback=None)
+    return {"gpus": max(1, len(parts)), "wall_time": wall_time}
+
+
+def find_cases(roots: list[str]) -> dict[str, str]:
+    # each run's directory and its path under the root it was found in,
+    # e.g. entropy-filter/order3-elems64 in a sweep's output
+    cases = {}
+    for root in roots:
+        for path in glob.glob(os.path.join(root, "**", "order*-elems*"), recursive=True):
+            if CASE_RE.fullmatch(os.path.basename(path)) and os.path.isdir(path):
+                path = os.path.normpath(path)
+                cases.setdefault(path, os.path.relpath(path, root))
+
+    return dict(sorted(cases.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="compares the dissipation rate of every tgv run against a reference and "
+        "tabulates the accuracy against the gpu hours spent"
+    )
+    parser.add_argument("roots", nargs="+", help="directories holding order*-elems* runs")
+    parser.add_argument(
+        "--reference",
+        help="a csv of t and eps (or Ek) to compare against (default: the finest run of "
+        "each shock-capturing scheme)",
+    )
+    parser.add_argument(
+        "--half-width",
+        type=float,
+        default=0.25,
+        help="the time either side of each point fitted for the derivative of Ek",
+    )
+    parser.add_argument(
+        "--volume",
+        type=float,
+        default=1.0,
+        help="divides the integrals by the domain volume, e.g. (2 pi)^3 to match per unit "
+        "volume reference data",
+    )
+    parser.add_argument("-o", "--output", default="tgv-accuracy.csv")
+    args = parser.parse_args()
+
+    runs = {}
+    for case_dir, name in find_cases(args.roots).items():
+        integral = os.path.join(case_dir, "integral.csv")
+        if not os.path.exists(integral):
+            print(f"skipping {case_dir}: no integral.csv")
+            continue
+
+        order, elems = (int(g) for g in CASE_RE.fullmatch(os.path.basename(case_dir)).groups())
+        run = dissipation(integral, args.half_width, args.volume)
+        if len(run["t"]) < 3:
+            print(f"skipping {case_dir}: too few rows")
+            continue
+
+        # the sweep puts each shock-capturing scheme in its own directory
+        run.update(name=name, scheme=os.path.dirname(name))
+        run.update(order=order, elems=elems, dofs=(elems * (order + 1)) ** 3)
+        run.update(cost(case_dir))
+        runs[case_dir] = run
+
+    if not runs:
+        sys.exit("no runs found")
+
+    schemes = {}
+    for case_dir, run in runs.items():
+        schemes.setdefault(run["scheme"], []).append(case_dir)
+
+    refs = {}
+    if args.reference:
+        ref = read_reference(args.reference, args.half_width)
+        refs = {scheme: (args.reference, ref) for scheme in schemes}
+    else:
+        # without reference data the most resolved complete run of each
+        # scheme stands in, as the schemes dissipate differently and the
+        # finest run of one would bias the errors of the others
+        for scheme, cases in schemes.items():
+            complete = [c for c in cases if runs[c]["t"][-1] >= T_END - 1e-6] or cases
+            ref_name = max(complete, key=lambda c: runs[c]["dofs"])
+            refs[scheme] = (ref_name, runs[ref_name])
+            print(
+                f"no --reference given, comparing the {scheme or '.'} runs against the "
+                f"finest, {runs[ref_name]['name']}"
+            )
+
+    rows = []
+    for case_dir, run in runs.items():
+        ref_name, ref = refs[run["scheme"]]
+        row = {
+            "case": case_dir,
+            "order": run["order"],
+            "elems": run["elems"],
+            "dofs": run["dofs"],
+            "gpus": run["gpus"],
+            "wall_hours": run["wall_time"] / 3600 if run["wall_time"] is not None else None,
+            "t_end": float(run["t"][-1]),
+            "reference": ref_name,
+        }
+        row["gpu_hours"] = (
+            row["wall_hours"] * run["gpus"] if row["wall_hours"] is not None else None
+        )
+
+        # the share of the dissipation not accounted for by the resolved
+        # strain and dilatation, i.e. what the scheme itself dissipates
+        total = np.trapezoid(run["eps"], run["t"])
+        row["numerical_fraction"] = float(
+            (total - np.trapezoid(run["resolved"], run["t"])) / total
+        ) if np.any(run["resolved"]) else None
+
+        if case_dir == ref_name:
+            row.update(l2=0.0, linf=0.0, t_peak=peak(run["t"], run["eps"])[0])
+            row.update(t_peak_error=0.0, eps_peak_error=0.0)
+        else:
+            row.update(errors(run, ref))
+
+        rows.append(row)
+
+    rows.sort(key=lambda r: (r["gpu_hours"] is None, r["gpu_hours"] or 0.0, r["dofs"]))
+
+    with open(args.output, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    def fmt(value, spec):
+        return format(value, spec) if value is not None else "-"
+
+    width = max(len("case"), *(len(runs[r["case"]]["name"]) for r in rows))
+    print(
+        f"{'case':<{width}} {'dofs':>9} {'gpus':>4} {'gpu h':>7} {'l2':>8} {'linf':>8} "
+        f"{'t peak':>7} {'dt peak':>8}"
+    )
+    for r in rows:
+        print(
+            f"{runs[r['case']]['name']:<{width}} {r['dofs']:>9.2e} {fmt(r['gpus'], '>4')} "
+            f"{fmt(r['gpu_hours'], '>7.2f')} {r['l2']:>8.2e} {r['linf']:>8.2e} "
+            f"{r['t_peak']:>7.3f} {r['t_peak_error']:>+8.3f}"
+        )
+    print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
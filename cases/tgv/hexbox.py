@@ -0,0 +1,387 @@
+import argparse
+import math
+import os
+import time
+import uuid
+
+import h5py
+import numpy as np
+
+# pyfr's connectivity records: element type, element index, face index and
+# flags, with faces numbered -z, -y, +x, +y, -x, +z
+CON_DTYPE = np.dtype("S4,i4,i1,i2")
+FACES = {0: (4, 2), 1: (1, 3), 2: (0, 5)}
+
+# the 2.x layout's element records: the node numbers, whether the element is
+# curved, and for each face the codec index of the face it meets and the
+# element that face is on
+FACE_DTYPE = np.dtype([("cidx", np.int16), ("off", np.int64)])
+ELE_DTYPE = np.dtype([("nodes", np.int64, 8), ("curved", bool), ("faces", FACE_DTYPE, 6)])
+CODEC = ["eles/hex"] + [f"eles/hex/{i}" for i in range(6)]
+
+# the axis and direction of each face, and the face of the neighbour it meets
+FACE_STEPS = [(2, -1), (1, -1), (0, 1), (1, 1), (0, -1), (2, 1)]
+OPPOSITE = [5, 3, 4, 1, 2, 0]
+
+LAYOUTS = ["1.x", "2.x"]
+
+
+def factorise(nparts: int) -> tuple[int, int, int]:
+    # the most cube-like split of the box into nparts blocks, as that keeps
+    # the faces shared between partitions to a minimum
+    best = None
+    for px in range(1, nparts + 1):
+        if nparts % px:
+            continue
+        for py in range(1, nparts // px + 1):
+            if (nparts // px) % py:
+                continue
+            pz = nparts // (px * py)
+            cost = px * py + py * pz + px * pz
+            if best is None or cost < best[0]:
+                best = (cost, (px, py, pz))
+
+    return best[1]
+
+
+class Block:
+    # the part of the n^3 box owned by one partition, with its elements
+    # numbered x fastest, then y, then z
+    def __init__(self, index: int, grid: tuple, bounds: list[np.ndarray]):
+        self.index = index
+        self.grid = grid
+        self.lo = [int(bounds[a][grid[a]]) for a in range(3)]
+        self.hi = [int(bounds[a][grid[a] + 1]) for a in range(3)]
+        self.shape = [self.hi[a] - self.lo[a] for a in range(3)]
+
+    @property
+    def neles(self) -> int:
+        return math.prod(self.shape)
+
+    def ids(self, k0: int, k1: int) -> np.ndarray:
+        # (z, y, x) local element indices of layers k0 to k1
+        nx, ny, _ = self.shape
+        return np.arange(k0 * nx * ny, k1 * nx * ny, dtype=np.int32).reshape(-1, ny, nx)
+
+    def face_ids(self, axis: int, side: int) -> np.ndarray:
+        # local indices of the elements on the low (0) or high (1) side of
+        # the block, in an order shared by both blocks meeting there
+        ids = self.ids(0, self.shape[2])
+        idx = [slice(None)] * 3
+        idx[2 - axis] = -side
+        return ids[tuple(idx)].ravel()
+
+
+def _con(eidx: np.ndarray, fidx: int) -> np.ndarray:
+    con = np.empty(len(eidx), dtype=CON_DTYPE)
+    con["f0"] = b"hex"
+    con["f1"] = eidx
+    con["f2"] = fidx
+    con["f3"] = 0
+    return con
+
+
+def _write_nodes(ds, block: Block, h: float, origin: float, chunk_layers: int):
+    nx, ny, nz = block.shape
+    i = np.arange(nx)
+    j = np.arange(ny)
+
+    for k0 in range(0, nz, chunk_layers):
+        k1 = min(nz, k0 + chunk_layers)
+        k = np.arange(k0, k1)
+        kk, jj, ii = np.meshgrid(k, j, i, indexing="ij")
+
+        start = k0 * nx * ny
+        stop = k1 * nx * ny
+        spts = np.empty((8, stop - start, 3))
+
+        # vertices in tensor-product order, x varying fastest
+        for m in range(8):
+            spts[m, :, 0] = origin + (block.lo[0] + ii.ravel() + (m & 1)) * h
+            spts[m, :, 1] = origin + (block.lo[1] + jj.ravel() + ((m >> 1) & 1)) * h
+            spts[m, :, 2] = origin + (block.lo[2] + kk.ravel() + ((m >> 2) & 1)) * h
+
+        ds[:, start:stop] = spts
+
+
+def _internal_pairs(block: Block, axis: int, wrap: bool, k0: int, k1: int):
+    # neighbouring elements of the block along axis within layers k0 to k1,
+    # including the periodic pairs when the block spans the whole box
+    nx, ny, nz = block.shape
+    ids = block.ids(k0, k1)
+
+    if axis == 0:
+        left, right = ids[:, :, :-1], ids[:, :, 1:]
+        if wrap:
+            left = np.concatenate([left, ids[:, :, -1:]], axis=2)
+            right = np.concatenate([right, ids[:, :, :1]], axis=2)
+    elif axis == 1:
+        left, right = ids[:, :-1], ids[:, 1:]
+        if wrap:
+            left = np.concatenate([left, ids[:, -1:]], axis=1)
+            right = np.concatenate([right, ids[:, :1]], axis=1)
+    else:
+        last = min(k1, nz - 1)
+        left = ids[: max(0, last - k0)]
+        right = left + nx * ny
+        if wrap and k1 == nz:
+            left = np.concatenate([left, ids[-1:]])
+            right = np.concatenate([right, block.ids(0, 1)])
+
+    return left.ravel(), right.ravel()
+
+
+def _count_internal(block: Block, axis: int, wrap: bool) -> int:
+    n = block.shape[axis] - (0 if wrap else 1)
+    return n * block.neles // block.shape[axis]
+
+
+def write_box(
+    filename: str,
+    n_elems: int,
+    nparts: int | tuple[int, int, int] = 1,
+    length: float = 1.0,
+    chunk_elems: int = 1 << 20,
+    layout: str = "2.x",
+):
+    if layout not in LAYOUTS:
+        raise ValueError(f"unknown mesh layout {layout}, expected one of {LAYOUTS}")
+
+    parts = factorise(nparts) if isinstance(nparts, int) else tuple(nparts)
+    if any(n_elems < p for p in parts):
+        raise ValueError(f"cannot split {n_elems} elements into {parts} partitions")
+
+    h = 2.0 * math.pi * length / n_elems
+    origin = -math.pi * length
+    bounds = [np.linspace(0, n_elems, p + 1).round().astype(int) for p in parts]
+
+    grids = [
+        (gx, gy, gz)
+        for gz in range(parts[2])
+        for gy in range(parts[1])
+        for gx in range(parts[0])
+    ]
+    blocks = {g: Block(i, g, bounds) for i, g in enumerate(grids)}
+
+    root, ext = os.path.splitext(filename)
+    tmp = f"{root}.{os.getpid()}.tmp{ext}"
+
+    try:
+        with h5py.File(tmp, "w") as f:
+            if layout == "1.x":
+                _write_1x(f, blocks, parts, h, origin, chunk_elems)
+            else:
+                _write_2x(f, blocks, parts, bounds, n_elems, h, origin, chunk_elems)
+
+        os.replace(tmp, filename)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _write_1x(f, blocks: dict, parts: tuple, h: float, origin: float, chunk_elems: int):
+    # spt_hex_p{n} and con_p{n} for each partition, with the con_p{a}p{b}
+    # interfaces between them
+    f["mesh_uuid"] = np.array(str(uuid.uuid4()), dtype="S")
+
+    for block in blocks.values():
+        p = block.index
+        nx, ny, _ = block.shape
+        chunk_layers = max(1, chunk_elems // (nx * ny))
+
+        ds = f.create_dataset(
+            f"spt_hex_p{p}",
+            shape=(8, block.neles, 3),
+            dtype=float,
+            chunks=(8, nx * ny, 3),
+        )
+        _write_nodes(ds, block, h, origin, chunk_layers)
+
+        # faces inside the partition, periodic ones included when the
+        # partition spans the box in that direction
+        wraps = [parts[a] == 1 for a in range(3)]
+        ncon = sum(_count_internal(block, a, wraps[a]) for a in range(3))
+        con = f.create_dataset(
+            f"con_p{p}",
+            shape=(2, ncon),
+            dtype=CON_DTYPE,
+            chunks=(2, min(ncon, chunk_elems)) if ncon else None,
+        )
+
+        off = 0
+        for axis in range(3):
+            lf, rf = FACES[axis]
+            for k0 in range(0, block.shape[2], chunk_layers):
+                k1 = min(block.shape[2], k0 + chunk_layers)
+                left, right = _internal_pairs(block, axis, wraps[axis], k0, k1)
+                con[0, off : off + len(left)] = _con(left, rf)
+                con[1, off : off + len(left)] = _con(right, lf)
+                off += len(left)
+
+    # faces shared between partitions, each pair written in the same
+    # order on both sides
+    if len(blocks) > 1:
+        shared = {}
+        for g, block in blocks.items():
+            for axis in range(3):
+                if parts[axis] == 1:
+                    continue
+
+                ng = list(g)
+                ng[axis] = (g[axis] + 1) % parts[axis]
+                other = blocks[tuple(ng)]
+                lf, rf = FACES[axis]
+
+                a, b = block.index, other.index
+                shared.setdefault((a, b), []).append(_con(block.face_ids(axis, 1), rf))
+                shared.setdefault((b, a), []).append(_con(other.face_ids(axis, 0), lf))
+
+        for (a, b), cons in shared.items():
+            f[f"con_p{a}p{b}"] = np.concatenate(cons)
+
+
+def _write_2x(
+    f,
+    blocks: dict,
+    parts: tuple,
+    bounds: list[np.ndarray],
+    n: int,
+    h: float,
+    origin: float,
+    chunk_elems: int,
+):
+    # a node table, the elements with their face connectivity in eles/hex,
+    # numbered a partition at a time, and a partitioning of them, as pyfr
+    # import and pyfr partition add write them
+    f["codec"] = np.array(CODEC, dtype="S")
+    f["creator"] = np.array("hexbox", dtype="S")
+    f["mesh-uuid"] = np.array(str(uuid.uuid4()), dtype="S")
+    f["version"] = 1
+
+    # the grid's nodes are not shared across the periodic boundaries, as in
+    # an imported mesh, so each is on 1, 2, 4 or 8 elements
+    ndtype = np.dtype([("location", float, 3), ("valency", np.uint16)])
+    nodes = f.create_dataset("nodes", shape=((n + 1) ** 3,), dtype=ndtype)
+    c = np.arange(n + 1)
+    inner = 1 + ((c > 0) & (c < n))
+    layers = max(1, chunk_elems // (n + 1) ** 2)
+    for k0 in range(0, n + 1, layers):
+        k = c[k0 : k0 + layers]
+        kk, jj, ii = np.meshgrid(k, c, c, indexing="ij")
+        rec = np.empty(kk.size, dtype=ndtype)
+        rec["location"] = origin + h * np.stack([ii.ravel(), jj.ravel(), kk.ravel()], axis=1)
+        rec["valency"] = (inner[ii] * inner[jj] * inner[kk]).ravel()
+        nodes[k0 * (n + 1) ** 2 : (k0 + len(k)) * (n + 1) ** 2] = rec
+
+    ordered = sorted(blocks.values(), key=lambda b: b.index)
+    offsets = np.cumsum([0] + [b.neles for b in ordered])
+    sizes = [np.diff(bounds[a]) for a in range(3)]
+
+    def element_ids(g: list[np.ndarray]) -> np.ndarray:
+        b = [np.searchsorted(bounds[a], g[a], side="right") - 1 for a in range(3)]
+        local = [g[a] - bounds[a][b[a]] for a in range(3)]
+        index = b[0] + parts[0] * (b[1] + parts[1] * b[2])
+        return offsets[index] + local[0] + sizes[0][b[0]] * (local[1] + sizes[1][b[1]] * local[2])
+
+    eles = f.create_dataset("eles/hex", shape=(offsets[-1],), dtype=ELE_DTYPE)
+    eles.attrs["pts"] = np.array(
+        [[x, y, z] for z in [-1.0, 1.0] for y in [-1.0, 1.0] for x in [-1.0, 1.0]]
+    )
+
+    for block in ordered:
+        nx, ny, nz = block.shape
+        chunk_layers = max(1, chunk_elems // (nx * ny))
+
+        for k0 in range(0, nz, chunk_layers):
+            k1 = min(nz, k0 + chunk_layers)
+            kk, jj, ii = np.meshgrid(
+                np.arange(k0, k1), np.arange(ny), np.arange(nx), indexing="ij"
+            )
+            g = [block.lo[0] + ii.ravel(), block.lo[1] + jj.ravel(), block.lo[2] + kk.ravel()]
+
+            rec = np.zeros(len(g[0]), dtype=ELE_DTYPE)
+
+            # vertices in tensor-product order, x varying fastest
+            for m in range(8):
+                x, y, z = (g[a] + ((m >> a) & 1) for a in range(3))
+                rec["nodes"][:, m] = x + (n + 1) * (y + (n + 1) * z)
+
+            # every face meets a neighbour, across the periodic boundaries too
+            for face, (axis, step) in enumerate(FACE_STEPS):
+                ng = list(g)
+                ng[axis] = (g[axis] + step) % n
+                rec["faces"]["cidx"][:, face] = CODEC.index(f"eles/hex/{OPPOSITE[face]}")
+                rec["faces"]["off"][:, face] = element_ids(ng)
+
+            start = offsets[block.index] + k0 * nx * ny
+            eles[start : start + len(rec)] = rec
+
+    # the whole box as one part, as pyfr import always writes, and the
+    # blocks as another when there is more than one
+    f["partitionings/1/eles"] = np.arange(offsets[-1], dtype=np.int64)
+    f["partitionings/1/eles"].attrs["regions"] = np.array([[0, offsets[-1]]], dtype=np.int64)
+
+    if len(ordered) > 1:
+        neighbours = []
+        for block in ordered:
+            near = set()
+            for axis in range(3):
+                for step in [-1, 1]:
+                    ng = list(block.grid)
+                    ng[axis] = (ng[axis] + step) % parts[axis]
+                    near.add(blocks[tuple(ng)].index)
+            near.discard(block.index)
+            neighbours.append(sorted(near))
+
+        pname = f"partitionings/{len(ordered)}"
+        f[f"{pname}/eles"] = np.arange(offsets[-1], dtype=np.int64)
+        f[f"{pname}/eles"].attrs["regions"] = np.stack([offsets[:-1], offsets[1:]], axis=1)
+        f[f"{pname}/neighbours"] = np.array(sum(neighbours, []), dtype=np.int64)
+        f[f"{pname}/neighbours"].attrs["regions"] = np.cumsum(
+            [0] + [len(nb) for nb in neighbours]
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="writes the periodic tgv box straight to a .pyfrm file"
+    )
+    parser.add_argument("n_elems", type=int, help="the number of elements along each side")
+    parser.add_argument(
+        "-p",
+        "--partitions",
+        default="1",
+        help="a number of partitions, or an explicit PXxPYxPZ split of the box",
+    )
+    parser.add_argument("-o", "--output", help="the mesh filename")
+    parser.add_argument(
+        "--layout",
+        choices=LAYOUTS,
+        default="2.x",
+        help="2.x for the eles/ meshes pyfr partition add works on, 1.x for spt_/con_ ones",
+    )
+    parser.add_argument("--length", type=float, default=1.0, help="the box is 2 pi length wide")
+    parser.add_argument(
+        "--chunk",
+        type=int,
+        default=1 << 20,
+        help="roughly how many elements to generate at once",
+    )
+    args = parser.parse_args()
+
+    if "x" in args.partitions:
+        nparts = tuple(int(p) for p in args.partitions.split("x"))
+        if len(nparts) != 3:
+            parser.error("an explicit split needs three factors, e.g. 2x2x2")
+    else:
+        nparts = int(args.partitions)
+
+    filename = args.output or f"{args.n_elems}-elems-tgv-mesh.pyfrm"
+
+    start = time.perf_counter()
+    write_box(filename, args.n_elems, nparts, args.length, args.chunk, args.layout)
+    print(f"wrote {args.n_elems ** 3} elements to {filename} in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
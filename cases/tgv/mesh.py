@@ -1,15 +1,149 @@
+import argparse
 import math
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 import gmsh
 
+import hexbox
 
-def main():
-    for n_elements in [16, 32, 64, 128, 256]:
-        genmesh(n_elements)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import mshout
 
 
-def genmesh(n_elems: int):
+def main():
+    parser = argparse.ArgumentParser(
+        description="builds the tgv box meshes, each size in its own process"
+    )
+    parser.add_argument(
+        "sizes",
+        nargs="*",
+        type=int,
+        default=[16, 32, 64, 128, 256],
+        help="the number of elements along each side",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="the number of meshes to build at once (default: one per size, up to the cpu count)",
+    )
+    parser.add_argument(
+        "-t",
+        "--threads",
+        type=int,
+        default=None,
+        help="gmsh threads per mesh (default: the cpus shared between the jobs)",
+    )
+    parser.add_argument("-o", "--outdir", default=".", help="where to write the meshes")
+    parser.add_argument(
+        "--import",
+        dest="pyfr_import",
+        action="store_true",
+        help="also convert each mesh to .pyfrm with pyfr import",
+    )
+    parser.add_argument(
+        "--direct",
+        action="store_true",
+        help="write the .pyfrm straight from numpy, skipping gmsh and pyfr import",
+    )
+    parser.add_argument(
+        "-f",
+        "--force",
+        action="store_true",
+        help="rebuild meshes which already exist",
+    )
+    args = parser.parse_args()
+
+    n_cpus = os.cpu_count() or 1
+    jobs = args.jobs or min(len(args.sizes), n_cpus)
+    threads = args.threads or max(1, n_cpus // jobs)
+    os.makedirs(args.outdir, exist_ok=True)
+
+    # the biggest meshes take by far the longest, so they go first
+    sizes = sorted(set(args.sizes), reverse=True)
+
+    failed = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {
+            pool.submit(
+                build, n, args.outdir, threads, args.pyfr_import, args.force, args.direct
+            ): n
+            for n in sizes
+        }
+
+        for future in as_completed(futures):
+            n = futures[future]
+            try:
+                print(future.result())
+            except Exception as e:
+                print(f"{n}: failed: {e}")
+                failed.append(n)
+
+    if failed:
+        raise SystemExit(f"failed to build meshes for sizes {sorted(failed)}")
+
+
+def build(
+    n_elems: int,
+    outdir: str,
+    threads: int,
+    pyfr_import: bool,
+    force: bool,
+    direct: bool = False,
+) -> str:
+    start = time.perf_counter()
+    msh_file = os.path.join(outdir, f"{n_elems}-elems-tgv-mesh.msh")
+    pyfrm_file = os.path.join(outdir, f"{n_elems}-elems-tgv-mesh.pyfrm")
+
+    if direct:
+        if force or not os.path.exists(pyfrm_file):
+            hexbox.write_box(pyfrm_file, n_elems)
+            status = "written directly"
+        else:
+            status = "kept existing mesh"
+        return f"{n_elems}: {status} in {time.perf_counter() - start:.1f} s"
+
+    if force or not os.path.exists(msh_file):
+        try:
+            genmesh(n_elems, msh_file, threads)
+        finally:
+            # the worker process is reused, so never leave gmsh initialised
+            if gmsh.isInitialized():
+                gmsh.finalize()
+        status = "meshed"
+    else:
+        status = "kept existing mesh"
+
+    if pyfr_import and (status == "meshed" or not os.path.exists(pyfrm_file)):
+        # pyfr works the format out from the extension, so the temporary
+        # file has to keep it
+        tmp = os.path.join(outdir, f"{n_elems}-elems-tgv-mesh.{os.getpid()}.tmp.pyfrm")
+        try:
+            subprocess.run(
+                ["pyfr", "import", msh_file, tmp],
+                check=True,
+                capture_output=True,
+                text=True,
+            )
+        except subprocess.CalledProcessError as e:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise RuntimeError(f"pyfr import failed: {e.stderr.strip()}") from None
+        os.replace(tmp, pyfrm_file)
+        status += ", imported"
+
+    return f"{n_elems}: {status} in {time.perf_counter() - start:.1f} s"
+
+
+def genmesh(n_elems: int, filename: str | None = None, threads: int = 1):
     gmsh.initialize()
+    gmsh.option.setNumber("General.Terminal", 0)
+    gmsh.option.setNumber("General.NumThreads", threads)
     gmsh.model.add("tgv")
 
     pi = math.pi
@@ -80,9 +214,11 @@ def genmesh(n_elems: int):
     gmsh.model.mesh.setTransfiniteVolume(box)
 
     gmsh.model.mesh.generate(3)
-    gmsh.write(f"{n_elems}-elems-tgv-mesh.msh")
 
-    # gmsh.fltk.run()
+    if filename is None:
+        filename = f"{n_elems}-elems-tgv-mesh.msh"
+    mshout.write(filename)
+
     gmsh.finalize()
 
 
@@ -0,0 +1,514 @@
+import argparse
+import configparser
+import glob
+import json
+import math
+import os
+import shlex
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import csvtail
+import flow
+import partcache
+import restart
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# the sweep the sbatch scripts used to run one after another
+DEFAULT_SWEEP = ["1:32,64,128,256", "3:16,32,64,128"]
+
+# dt times the elements per side of the hand-checked dt the sbatch scripts
+# used for each order (1e-2 at 32 elements for order 1, at 16 for order 3,
+# halving with every doubling). the derived dt is never allowed past them, as
+# at --cfl 0.3 it comes out some 9% larger at order 1
+VALIDATED_DT_ELEMS = {1: 0.32, 3: 0.16}
+
+# the settings each shock-capturing scheme adds to the case, which replace
+# those of the others
+SHOCK_CAPTURING = {
+    "entropy-filter": {
+        "solver-entropy-filter": {
+            "d-min": "1e-6",
+            "p-min": "1e-6",
+            "e-tol": "1e-6",
+            "e-func": "physical",
+            "niters": "2",
+        }
+    },
+    "artificial-viscosity": {
+        "solver-artificial-viscosity": {"max-artvisc": "0.01", "s0": "0.01", "kappa": "5.0"}
+    },
+    "none": {},
+}
+
+JOB_SCRIPT = """#!/bin/bash
+#SBATCH --job-name={name}
+#SBATCH --partition={partition}
+#SBATCH --nodes=1
+#SBATCH --ntasks={gpus}
+#SBATCH --cpus-per-task={cpus}
+#SBATCH --mem={mem}
+#SBATCH --gres=gpu:{gpus}
+#SBATCH --time={time}
+#SBATCH --requeue
+#SBATCH --output={case_dir}/{name}-%j.log
+#SBATCH --error={case_dir}/{name}-%j.err
+{constraint}
+source $HOME/pyfr/.venv/bin/activate
+source $HOME/pyfr/initenv.sh
+
+python {sweep} run {case_dir_quoted}
+"""
+
+
+def parse_sweep(entries: list[str]) -> list[tuple[int, int, int | None]]:
+    # ORDER:MESH[@GPUS],MESH[@GPUS],... -> (order, elements per side, gpus)
+    cases = []
+    for entry in entries:
+        order, _, meshes = entry.partition(":")
+        for mesh in meshes.split(","):
+            elems, _, gpus = mesh.partition("@")
+            cases.append((int(order), int(elems), int(gpus) if gpus else None))
+
+    return cases
+
+
+def case_dt(cfg: configparser.ConfigParser, order: int, elems: int, cfl: float) -> float:
+    # the stable dt on the box's uniform elements, capped at the validated
+    # one and shortened so that a whole number of steps lands on every output
+    # time
+    fs = flow.freestream(cfg)
+    h = 2 * math.pi / elems
+    dt, _ = flow.stable_dt(h, order, fs["mach"], fs["reynolds"], cfl)
+    if order in VALIDATED_DT_ELEMS:
+        dt = min(dt, VALIDATED_DT_ELEMS[order] / elems)
+
+    dt_out = flow.ini_number(cfg, "soln-plugin-writer", "dt-out")
+    return dt_out / math.ceil(dt_out / dt)
+
+
+def case_name(order: int, elems: int) -> str:
+    return f"order{order}-elems{elems}"
+
+
+def case_path(outdir: str, shock_capturing: str, order: int, elems: int) -> str:
+    return os.path.abspath(os.path.join(outdir, shock_capturing, case_name(order, elems)))
+
+
+def mesh_file(mesh_dir: str, elems: int) -> str:
+    return os.path.abspath(os.path.join(mesh_dir, f"{elems}-elems-tgv-mesh.pyfrm"))
+
+
+def gpu_count(value: str) -> int | str:
+    return value if value == "auto" else int(value)
+
+
+def write_case(
+    template: str,
+    outdir: str,
+    order: int,
+    elems: int,
+    shock_capturing: str,
+    gpus: int,
+    cfl: float,
+    mesh: str,
+    partition_cache: str,
+    force: bool = False,
+) -> dict:
+    cfg = flow.read_ini(template)
+    cfg.set("solver", "order", str(order))
+
+    for sections in SHOCK_CAPTURING.values():
+        for section in sections:
+            cfg.remove_section(section)
+    if shock_capturing == "none":
+        cfg.remove_option("solver", "shock-capturing")
+    else:
+        cfg.set("solver", "shock-capturing", shock_capturing)
+    for section, values in SHOCK_CAPTURING[shock_capturing].items():
+        cfg.add_section(section)
+        for key, value in values.items():
+            cfg.set(section, key, value)
+
+    dt = case_dt(cfg, order, elems, cfl)
+    cfg.set("solver-time-integrator", "dt", repr(dt))
+
+    case_dir = case_path(outdir, shock_capturing, order, elems)
+    if force:
+        # a rerun starts from scratch rather than from the old checkpoints
+        shutil.rmtree(os.path.join(case_dir, "out"), ignore_errors=True)
+        for filename in restart.plugin_csvs(cfg, case_dir):
+            csvtail.remove(filename)
+    os.makedirs(os.path.join(case_dir, "out"), exist_ok=True)
+
+    ini_file = os.path.join(case_dir, f"tgv-ord{order}-elems{elems}.ini")
+    with open(ini_file, "w") as f:
+        cfg.write(f)
+
+    job_file = os.path.join(case_dir, "job.json")
+    job = {}
+    if os.path.exists(job_file) and not force:
+        with open(job_file) as f:
+            job = json.load(f)
+
+    job.update(
+        {
+            "order": order,
+            "elems": elems,
+            "shock_capturing": shock_capturing,
+            "dofs": (elems * (order + 1)) ** 3,
+            "cfl": cfl,
+            "dt": dt,
+            "gpus": gpus,
+            "mesh": mesh,
+            "partition_cache": os.path.abspath(partition_cache),
+            "ini": ini_file,
+        }
+    )
+    job.setdefault("status", "pending")
+    write_job(case_dir, job)
+
+    return {"case_dir": case_dir, **job}
+
+
+def read_job(case_dir: str) -> dict:
+    with open(os.path.join(case_dir, "job.json")) as f:
+        return json.load(f)
+
+
+def write_job(case_dir: str, job: dict):
+    job_file = os.path.join(case_dir, "job.json")
+    tmp = f"{job_file}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(job, f, indent=2)
+    os.replace(tmp, job_file)
+
+
+def slurm_job_queued(job_id: str) -> bool:
+    try:
+        proc = subprocess.run(
+            ["squeue", "-h", "-j", str(job_id), "-o", "%T"],
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        # without squeue there is no telling, so it is taken to be queued
+        return True
+
+    if proc.returncode != 0:
+        return "Invalid job id" not in proc.stderr
+    return bool(proc.stdout.strip())
+
+
+def active(job: dict) -> bool:
+    # whether a job may still be working on the case. a slurm job that has
+    # left the queue, or a local run whose process has gone, was killed
+    # without being requeued and can safely be run again from its checkpoint
+    if job.get("status") not in ["submitted", "running"]:
+        return False
+
+    if job.get("slurm_job_id"):
+        return slurm_job_queued(job["slurm_job_id"])
+    if job.get("pid") and job.get("host") == socket.gethostname():
+        try:
+            os.kill(job["pid"], 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+
+    return True
+
+
+def last_write(case_dir: str) -> float | None:
+    # when a run last wrote a solution or a plugin row
+    files = glob.glob(os.path.join(case_dir, "out", "*"))
+    files += glob.glob(os.path.join(case_dir, "*.csv"))
+    return max(map(os.path.getmtime, files), default=None)
+
+
+def run_case(case_dir: str, backend: str = "cuda", env: dict | None = None) -> dict:
+    # partitions and runs, or restarts, one case written by write_case,
+    # recording how it went and the wall clock spent on it over every attempt
+    # in its job.json for analyse.py
+    job = read_job(case_dir)
+    gpus = job["gpus"]
+
+    if job.get("started") is not None:
+        # the last attempt was killed, so its time counts up to the last
+        # thing it wrote. this goes by started rather than the status, which
+        # a resubmission sets back to submitted
+        end = last_write(case_dir)
+        if end is not None and end > job["started"]:
+            job["wall_time"] = job.get("wall_time", 0.0) + end - job["started"]
+        job["started"] = None
+
+    mesh = job["mesh"]
+    if gpus > 1:
+        mesh = os.path.join(case_dir, os.path.basename(job["mesh"]))
+        cache = partcache.PartitionCache(job["partition_cache"])
+        if cache.get(job["mesh"], mesh, gpus):
+            print(f"partitioned {job['mesh']} {gpus} ways")
+
+    cmd, t_restart = restart.prepare(case_dir, mesh, job["ini"], gpus, backend)
+    if cmd is None:
+        job.update(status="done", returncode=0)
+        write_job(case_dir, job)
+        return job
+    if t_restart is not None:
+        print(f"restarting {case_dir} from t = {t_restart:g}")
+        job["restarts"] = job.get("restarts", 0) + 1
+
+    job.update(
+        status="running",
+        started=time.time(),
+        slurm_job_id=os.environ.get("SLURM_JOB_ID"),
+        host=socket.gethostname(),
+        pid=os.getpid(),
+    )
+    write_job(case_dir, job)
+
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=case_dir, env=env)
+
+    job.update(
+        status="done" if proc.returncode == 0 else "failed",
+        returncode=proc.returncode,
+        wall_time=job.get("wall_time", 0.0) + time.perf_counter() - start,
+        started=None,
+    )
+    write_job(case_dir, job)
+    return job
+
+
+class DevicePool:
+    # hands out device ids to the cases running at once, so concurrent runs
+    # never share a gpu
+    def __init__(self, devices: list[str]):
+        self.free = list(devices)
+        self.cond = threading.Condition()
+
+    def acquire(self, n: int) -> list[str]:
+        with self.cond:
+            self.cond.wait_for(lambda: len(self.free) >= n)
+            taken, self.free = self.free[:n], self.free[n:]
+            return taken
+
+    def release(self, devices: list[str]):
+        with self.cond:
+            self.free.extend(devices)
+            self.cond.notify_all()
+
+
+def run_local(cases: list[dict], devices: list[str], backend: str):
+    pool = DevicePool(devices)
+
+    def run(case: dict) -> dict:
+        taken = pool.acquire(case["gpus"])
+        try:
+            env = dict(os.environ, CUDA_VISIBLE_DEVICES=",".join(taken))
+            return run_case(case["case_dir"], backend, env)
+        finally:
+            pool.release(taken)
+
+    # the biggest cases take by far the longest, so they go first
+    cases = sorted(cases, key=lambda c: c["dofs"], reverse=True)
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=len(devices)) as executor:
+        futures = {executor.submit(run, case): case for case in cases}
+        for future in as_completed(futures):
+            case = futures[future]
+            name = os.path.basename(case["case_dir"])
+            try:
+                job = future.result()
+                print(f"{name}: {job['status']} in {job['wall_time']:.0f} s")
+                if job["status"] != "done":
+                    failed.append(name)
+            except Exception as e:
+                print(f"{name}: failed: {e}")
+                failed.append(name)
+
+    if failed:
+        raise SystemExit(f"failed cases: {', '.join(sorted(failed))}")
+
+
+def submit_slurm(cases: list[dict], args: argparse.Namespace):
+    for case in cases:
+        name = f"tgv-{case['shock_capturing']}-{case_name(case['order'], case['elems'])}"
+        script = JOB_SCRIPT.format(
+            name=name,
+            partition=args.partition,
+            gpus=case["gpus"],
+            cpus=args.cpus_per_task,
+            mem=args.mem,
+            time=args.time,
+            case_dir=case["case_dir"],
+            case_dir_quoted=shlex.quote(case["case_dir"]),
+            constraint=f"#SBATCH --constraint={args.constraint}\n" if args.constraint else "",
+            sweep=os.path.abspath(__file__),
+        )
+
+        script_file = os.path.join(case["case_dir"], "job.sh")
+        with open(script_file, "w") as f:
+            f.write(script)
+
+        if args.dry_run:
+            print(f"{name}: wrote {script_file}")
+            continue
+
+        proc = subprocess.run(
+            ["sbatch", "--parsable", script_file], capture_output=True, text=True, check=True
+        )
+        job_id = proc.stdout.strip().split(";")[0]
+
+        job = read_job(case["case_dir"])
+        job.update(status="submitted", slurm_job_id=job_id)
+        write_job(case["case_dir"], job)
+        print(f"{name}: submitted as {job_id}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="expands a tgv sweep of order x mesh x shock capturing from a template case "
+        "file and runs every case as its own job"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="run one case directory written by the sweep")
+    run_parser.add_argument("case_dir")
+    run_parser.add_argument("-b", "--backend", default="cuda")
+
+    for command in ["local", "slurm"]:
+        p = sub.add_parser(command, help=f"write the sweep and run it with the {command} executor")
+        p.add_argument(
+            "-s",
+            "--sweep",
+            nargs="+",
+            default=DEFAULT_SWEEP,
+            metavar="ORDER:MESH[@GPUS],...",
+            help="orders and their meshes, with an optional gpu count per mesh",
+        )
+        p.add_argument(
+            "--shock-capturing",
+            nargs="+",
+            default=["entropy-filter"],
+            choices=list(SHOCK_CAPTURING),
+        )
+        p.add_argument("--ini", default=os.path.join(HERE, "example.ini"))
+        p.add_argument("--mesh-dir", default=HERE, help="where the *-elems-tgv-mesh.pyfrm live")
+        p.add_argument("-o", "--outdir", default="tgv-results")
+        p.add_argument("--cfl", type=float, default=0.3)
+        p.add_argument(
+            "-g",
+            "--gpus",
+            type=gpu_count,
+            default=1,
+            help="gpus for meshes without @GPUS, or auto to keep the elements per gpu in --band",
+        )
+        p.add_argument(
+            "--band",
+            type=float,
+            nargs=2,
+            default=partcache.ELEMS_PER_RANK,
+            metavar=("LO", "HI"),
+            help="the elements per gpu --gpus auto aims for",
+        )
+        p.add_argument("--max-gpus", type=int, default=8)
+        p.add_argument(
+            "--partition-cache",
+            help="where partitioned meshes are kept (default: OUTDIR/.partition-cache)",
+        )
+        p.add_argument(
+            "-f",
+            "--force",
+            action="store_true",
+            help="rerun cases from scratch, even those finished, submitted or running",
+        )
+        p.add_argument(
+            "--dry-run", action="store_true", help="write the cases without running anything"
+        )
+
+    local = sub.choices["local"]
+    local.add_argument(
+        "--devices",
+        default=os.environ.get("CUDA_VISIBLE_DEVICES", "0"),
+        help="comma separated gpu ids to share between the cases",
+    )
+    local.add_argument("-b", "--backend", default="cuda")
+
+    slurm = sub.choices["slurm"]
+    slurm.add_argument("--partition", default="interruptible_gpu")
+    slurm.add_argument("--constraint", default="a100")
+    slurm.add_argument("--cpus-per-task", type=int, default=8)
+    slurm.add_argument("--mem", default="128G")
+    slurm.add_argument("--time", default="24:00:00")
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        job = run_case(os.path.abspath(args.case_dir), args.backend)
+        raise SystemExit(job["returncode"])
+
+    partition_cache = args.partition_cache or os.path.join(args.outdir, ".partition-cache")
+
+    cases = []
+    for shock_capturing in args.shock_capturing:
+        for order, elems, gpus in parse_sweep(args.sweep):
+            mesh = mesh_file(args.mesh_dir, elems)
+            if not os.path.exists(mesh):
+                parser.error(f"no mesh at {mesh}, build it with mesh.py")
+
+            # the case file and job.json of a finished case, or of one another
+            # job is still on, are left as they are
+            case_dir = case_path(args.outdir, shock_capturing, order, elems)
+            name = os.path.relpath(case_dir, args.outdir)
+            if os.path.exists(os.path.join(case_dir, "job.json")) and not args.force:
+                job = read_job(case_dir)
+                if job["status"] == "done":
+                    print(f"{name}: already done, skipping")
+                    continue
+                if active(job):
+                    print(f"{name}: already {job['status']}, skipping")
+                    continue
+
+            gpus = gpus or args.gpus
+            if gpus == "auto":
+                nelems = partcache.count_elements(mesh)
+                gpus = partcache.choose_ranks(nelems, tuple(args.band), args.max_gpus)
+
+            case = write_case(
+                args.ini,
+                args.outdir,
+                order,
+                elems,
+                shock_capturing,
+                gpus,
+                args.cfl,
+                mesh,
+                partition_cache,
+                args.force,
+            )
+            print(f"{name}: dt = {case['dt']:.4g} on {case['gpus']} gpu(s)")
+            cases.append(case)
+
+    if args.command == "slurm":
+        submit_slurm(cases, args)
+    elif not args.dry_run:
+        devices = args.devices.split(",")
+        too_big = [c for c in cases if c["gpus"] > len(devices)]
+        if too_big:
+            parser.error(f"{len(too_big)} case(s) need more than the {len(devices)} devices given")
+        run_local(cases, devices, args.backend)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,568 @@
 import os
 import subprocess
 import argparse
+import ctypes
+import ctypes.util
+import hashlib
+import json
 import re
+import resource
+import select
+import struct
+import tempfile
+import threading
+import time
+import traceback
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+MANIFEST_NAME = "export-manifest.json"
+MEM_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+
+def parse_mem(value: str) -> int:
+    match = re.fullmatch(r"\s*([\d\.]+)\s*([KMGT]?)B?\s*", value.upper())
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid memory size: {value}")
+
+    return int(float(match.group(1)) * MEM_UNITS[match.group(2)])
+
+
+def format_mem(nbytes: int) -> str:
+    return f"{nbytes / 1024**3:.2f}G"
+
+
+class MemoryBudget:
+    # headroom applied on top of the largest peak rss seen so far
+    headroom = 1.1
+
+    def __init__(self, limit: int | None):
+        self.limit = limit
+        self.in_use = 0
+        self.estimate = None
+        self._cond = threading.Condition()
+
+    def acquire(self) -> int:
+        if self.limit is None:
+            return 0
+
+        with self._cond:
+            while True:
+                # until one export has finished we have no idea how big they
+                # are, so the first one runs on its own to measure it
+                if self.estimate is None:
+                    reserve = self.limit
+                else:
+                    reserve = min(int(self.estimate * self.headroom), self.limit)
+
+                # always let a single export through, even if it looks too big
+                if self.in_use == 0 or self.in_use + reserve <= self.limit:
+                    self.in_use += reserve
+                    return reserve
+
+                self._cond.wait()
+
+    def release(self, reserved: int, peak_rss: int | None):
+        if self.limit is None:
+            return
+
+        with self._cond:
+            self.in_use -= reserved
+            if peak_rss:
+                self.estimate = max(self.estimate or 0, peak_rss)
+            self._cond.notify_all()
+
+
+def run_export(cmd: list[str]) -> tuple[int, int, str]:
+    # returns the exit code, the peak rss in bytes and any stderr output
+    with tempfile.TemporaryFile() as err:
+        proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=err)
+
+        # wait4 gives us the resource usage of this particular child, which
+        # subprocess.wait() throws away
+        _, status, rusage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+
+        err.seek(0)
+        stderr = err.read().decode(errors="replace")
+
+    # ru_maxrss is reported in kilobytes on linux
+    return proc.returncode, rusage.ru_maxrss * 1024, stderr
+
+
+class InProcessExporter:
+    # writer methods which build operators that only depend on the element
+    # type and the sub-division level, and so can be shared by every snapshot
+    cached_ops = ["_get_std_ele", "_get_mesh_op", "_get_soln_op"]
+
+    def __init__(self, mesh_file: str, divisor: int, precision: str,
+                 gradients: bool, extn: str):
+        import pyfr.writers.base as writer_base
+        from pyfr.readers.native import NativeReader
+        from pyfr.writers import get_writer_by_extn
+
+        self.mesh_file = mesh_file
+        self.divisor = divisor
+        self.precision = precision
+        self.gradients = gradients
+        self.extn = extn
+
+        # some writers expect mpi to be up, as it is under `pyfr export`
+        try:
+            from pyfr.mpiutil import init_mpi
+            init_mpi()
+        except ImportError:
+            pass
+
+        # read the mesh (and its partitioning) once and hand the same reader
+        # to every writer we construct, rather than re-opening the .pyfrm
+        self.mesh = NativeReader(mesh_file)
+        mesh_path = os.path.abspath(mesh_file)
+
+        def cached_reader(path, *args, **kwargs):
+            if os.path.abspath(path) == mesh_path:
+                return self.mesh
+            return NativeReader(path, *args, **kwargs)
+
+        writer_base.NativeReader = cached_reader
+
+        self.writer_cls = None
+        self._get_writer = get_writer_by_extn
+
+    def _cache_ops(self, cls):
+        for name in self.cached_ops:
+            fn = getattr(cls, name, None)
+            if fn is None or getattr(fn, "_op_cache", None) is not None:
+                continue
+
+            def wrapped(writer, *args, _fn=fn, _cache={}):
+                try:
+                    if args not in _cache:
+                        _cache[args] = _fn(writer, *args)
+                    return _cache[args]
+                except TypeError:
+                    # unhashable arguments, so nothing we can safely share
+                    return _fn(writer, *args)
+
+            wrapped._op_cache = True
+            setattr(cls, name, wrapped)
+
+    def export(self, soln_file: str, out_file: str):
+        args = argparse.Namespace(
+            meshf=self.mesh_file,
+            solnf=soln_file,
+            outf=out_file,
+            type=None,
+            divisor=self.divisor,
+            order=None,
+            precision=self.precision,
+            gradients=self.gradients,
+            fields=None,
+            eles=None,
+            eidxs=None,
+            pname=None,
+        )
+
+        writer = self._get_writer(self.extn, args)
+        if self.writer_cls is None:
+            self.writer_cls = type(writer)
+            self._cache_ops(self.writer_cls)
+
+        writer.write_out()
+
+
+class SnapshotWatcher:
+    # from <sys/inotify.h>
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CLOEXEC = 0o2000000
+
+    event_header = struct.Struct("iIII")
+
+    def __init__(self, path: str, poll_interval: float = 5.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.fd = None
+
+        # fall back to polling where inotify is unavailable (macOS, some
+        # network filesystems) rather than refusing to watch at all
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fd = libc.inotify_init1(self.IN_CLOEXEC)
+            if fd < 0:
+                raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+            wd = libc.inotify_add_watch(
+                fd, os.fsencode(path), self.IN_CLOSE_WRITE | self.IN_MOVED_TO
+            )
+            if wd < 0:
+                os.close(fd)
+                raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+
+            self.fd = fd
+        except (OSError, AttributeError):
+            print(f"inotify unavailable, polling {path} every {poll_interval}s")
+            self._seen = self._stat_all()
+
+    def _stat_all(self) -> dict:
+        stats = {}
+        for f in os.listdir(self.path):
+            if f.endswith(".pyfrs"):
+                st = os.stat(os.path.join(self.path, f))
+                stats[f] = (st.st_size, st.st_mtime_ns)
+
+        return stats
+
+    def wait(self, timeout: float | None) -> list[str]:
+        # returns the names of files which have been closed after writing or
+        # moved into the directory, or an empty list on timeout
+        if self.fd is None:
+            time.sleep(self.poll_interval if timeout is None else min(timeout, self.poll_interval))
+            stats = self._stat_all()
+            changed = [f for f, st in stats.items() if self._seen.get(f) != st]
+            self._seen = stats
+            return changed
+
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+
+        buf = os.read(self.fd, 64 * 1024)
+        names = []
+        offset = 0
+        while offset < len(buf):
+            _, _, _, length = self.event_header.unpack_from(buf, offset)
+            offset += self.event_header.size
+            name = buf[offset:offset + length].rstrip(b"\0")
+            offset += length
+            names.append(os.fsdecode(name))
+
+        return names
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+VTK_DTYPES = {
+    "Int8": "<i1", "UInt8": "<u1", "Int16": "<i2", "UInt16": "<u2",
+    "Int32": "<i4", "UInt32": "<u4", "Int64": "<i8", "UInt64": "<u8",
+    "Float32": "<f4", "Float64": "<f8",
+}
+
+
+def read_vtu(path: str) -> dict:
+    # a minimal reader for the appended-data .vtu files that pyfr export
+    # writes, merging all of the pieces into a single unstructured grid
+    with open(path, "rb") as f:
+        data = f.read()
+
+    start = data.index(b"<AppendedData")
+    raw = data.index(b"_", start) + 1
+    root = ET.fromstring(data[:start] + b"</VTKFile>")
+
+    if root.get("byte_order", "LittleEndian") != "LittleEndian":
+        raise ValueError(f"{path}: only little endian files are supported")
+
+    header = np.dtype(VTK_DTYPES[root.get("header_type", "UInt32")])
+    compressed = root.get("compressor") is not None
+
+    def read_array(darray):
+        if darray.get("format") != "appended":
+            raise ValueError(f"{path}: only appended data arrays are supported")
+
+        dtype = np.dtype(VTK_DTYPES[darray.get("type")])
+        offset = raw + int(darray.get("offset"))
+
+        if not compressed:
+            nbytes = int(np.frombuffer(data, header, 1, offset)[0])
+            arr = np.frombuffer(data, dtype, nbytes // dtype.itemsize, offset + header.itemsize)
+        else:
+            import zlib
+
+            nblocks = int(np.frombuffer(data, header, 1, offset)[0])
+            sizes = np.frombuffer(data, header, nblocks, offset + 3 * header.itemsize)
+            pos = offset + (3 + nblocks) * header.itemsize
+            chunks = []
+            for size in sizes:
+                chunks.append(zlib.decompress(data[pos:pos + int(size)]))
+                pos += int(size)
+            arr = np.frombuffer(b"".join(chunks), dtype)
+
+        ncomp = int(darray.get("NumberOfComponents", 1))
+        return arr.reshape(-1, ncomp) if ncomp > 1 else arr
+
+    grid = {
+        "points": [], "connectivity": [], "offsets": [0], "types": [],
+        "point_data": {}, "cell_data": {},
+    }
+    npts = 0
+    nconn = 0
+
+    for piece in root.iter("Piece"):
+        grid["points"].append(read_array(piece.find("Points/DataArray")))
+
+        cells = {d.get("Name"): d for d in piece.find("Cells")}
+        conn = read_array(cells["connectivity"]).astype(np.int64)
+        grid["connectivity"].append(conn + npts)
+        grid["offsets"].append(read_array(cells["offsets"]).astype(np.int64) + nconn)
+        grid["types"].append(read_array(cells["types"]).astype(np.uint8))
+
+        for kind, tag in [("point_data", "PointData"), ("cell_data", "CellData")]:
+            node = piece.find(tag)
+            for darray in (node if node is not None else []):
+                grid[kind].setdefault(darray.get("Name"), []).append(read_array(darray))
+
+        npts += int(piece.get("NumberOfPoints"))
+        nconn += len(conn)
+
+    grid["offsets"][0] = np.zeros(1, dtype=np.int64)
+    for key in ["points", "connectivity", "offsets", "types"]:
+        grid[key] = np.concatenate(grid[key])
+    for kind in ["point_data", "cell_data"]:
+        grid[kind] = {k: np.concatenate(v) for k, v in grid[kind].items()}
+
+    return grid
+
+
+class VtkHdfSeries:
+    # a whole time series in a single VTKHDF (version 2) file; the mesh is
+    # written once and each step only appends its point and cell data
+    def __init__(self, path: str, mesh_hash: str, settings: dict, compression: int = 4):
+        import h5py
+
+        self.h5py = h5py
+        self.path = path
+        self.compression = compression
+        self._lock = threading.Lock()
+
+        # the mesh and export settings the series was built with, so steps
+        # from another mesh or divisor are never mixed into it
+        self.stamp = {
+            "MeshHash": mesh_hash,
+            "ExportSettings": json.dumps(settings, sort_keys=True),
+        }
+        self.reset = os.path.exists(path) and self._read_stamp() != self.stamp
+        if self.reset:
+            os.remove(path)
+
+    def _read_stamp(self) -> dict | None:
+        try:
+            with self.h5py.File(self.path, "r") as f:
+                attrs = f["VTKHDF"].attrs
+                return {k: attrs[k] for k in self.stamp if k in attrs}
+        except (OSError, KeyError):
+            return None
+
+    def _dataset(self, group, name, arr):
+        return group.create_dataset(
+            name,
+            data=arr,
+            maxshape=(None,) + arr.shape[1:],
+            chunks=True,
+            compression="gzip",
+            compression_opts=self.compression,
+            shuffle=True,
+        )
+
+    def _append(self, group, name, arr) -> int:
+        if name not in group:
+            self._dataset(group, name, arr)
+            return 0
+
+        dset = group[name]
+        offset = dset.shape[0]
+        dset.resize(offset + arr.shape[0], axis=0)
+        dset[offset:] = arr
+        return offset
+
+    def _init_mesh(self, root, grid):
+        root.attrs["Version"] = np.array([2, 0], dtype=np.int64)
+        root.attrs["Type"] = np.bytes_("UnstructuredGrid")
+        for key, value in self.stamp.items():
+            root.attrs[key] = value
+
+        root.create_dataset("NumberOfPoints", data=[len(grid["points"])], dtype=np.int64)
+        root.create_dataset("NumberOfCells", data=[len(grid["types"])], dtype=np.int64)
+        root.create_dataset(
+            "NumberOfConnectivityIds", data=[len(grid["connectivity"])], dtype=np.int64
+        )
+        self._dataset(root, "Points", grid["points"])
+        self._dataset(root, "Connectivity", grid["connectivity"])
+        self._dataset(root, "Offsets", grid["offsets"])
+        self._dataset(root, "Types", grid["types"])
+
+    def append(self, t: float, vtu_path: str):
+        grid = read_vtu(vtu_path)
+
+        with self._lock, self.h5py.File(self.path, "a") as f:
+            root = f.require_group("VTKHDF")
+            if "Points" not in root:
+                self._init_mesh(root, grid)
+            elif (
+                root["NumberOfPoints"][0] != len(grid["points"])
+                or root["NumberOfCells"][0] != len(grid["types"])
+            ):
+                raise ValueError(f"{vtu_path}: mesh does not match the series")
+
+            # a re-exported step overwrites its old data rather than
+            # leaving it behind in the file
+            old = self._step_offsets(root, t)
+
+            offsets = {}
+            for kind, tag in [("point_data", "PointData"), ("cell_data", "CellData")]:
+                group = root.require_group(tag)
+                for name, arr in grid[kind].items():
+                    offset = old.get((tag, name))
+                    if offset is not None and offset + len(arr) <= group[name].shape[0]:
+                        group[name][offset : offset + len(arr)] = arr
+                        offsets[tag, name] = offset
+                    else:
+                        offsets[tag, name] = self._append(group, name, arr)
+
+            self._write_steps(root, t, offsets)
+
+    def _step_offsets(self, root, t) -> dict:
+        steps = root.get("Steps")
+        if steps is None or "Values" not in steps:
+            return {}
+
+        matches = np.flatnonzero(steps["Values"][:] == float(t))
+        if not len(matches):
+            return {}
+
+        i = int(matches[0])
+        return {
+            (tag, name): int(steps[f"{tag}Offsets/{name}"][i])
+            for tag in ["PointData", "CellData"]
+            if f"{tag}Offsets" in steps
+            for name in steps[f"{tag}Offsets"]
+        }
+
+    def _write_steps(self, root, t, offsets):
+        steps = root.require_group("Steps")
+
+        # the step tables are tiny, so rewrite them whole, keeping them sorted
+        # by time and pointing a re-exported step at its new offsets
+        table = {}
+        if "Values" in steps:
+            old = {
+                (tag, name): steps[f"{tag}Offsets/{name}"][:]
+                for tag in ["PointData", "CellData"]
+                if f"{tag}Offsets" in steps
+                for name in steps[f"{tag}Offsets"]
+            }
+            for i, tv in enumerate(steps["Values"][:]):
+                table[float(tv)] = {key: int(arr[i]) for key, arr in old.items()}
+        table[float(t)] = offsets
+
+        times = sorted(table)
+        nsteps = len(times)
+        zeros = np.zeros(nsteps, dtype=np.int64)
+
+        for name in list(steps):
+            del steps[name]
+
+        steps.attrs["NSteps"] = nsteps
+        steps.create_dataset("Values", data=np.array(times))
+        steps.create_dataset("PartOffsets", data=zeros)
+        steps.create_dataset("NumberOfParts", data=zeros + 1)
+        steps.create_dataset("PointOffsets", data=zeros)
+        steps.create_dataset("CellOffsets", data=zeros)
+        steps.create_dataset("ConnectivityIdOffsets", data=zeros)
+
+        for tag, name in {key for row in table.values() for key in row}:
+            data = [table[tv].get((tag, name), 0) for tv in times]
+            steps.require_group(f"{tag}Offsets").create_dataset(
+                name, data=np.array(data, dtype=np.int64)
+            )
+
+
+def file_hash(path: str, known: dict | None = None) -> str:
+    st = os.stat(path)
+
+    # hashing a multi-gigabyte snapshot is not free, so trust a hash we have
+    # already recorded for a file whose size and mtime have not changed
+    if (
+        known
+        and known.get("size") == st.st_size
+        and known.get("mtime_ns") == st.st_mtime_ns
+    ):
+        return known["hash"]
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+
+    return h.hexdigest()
+
+
+def file_record(path: str, known: dict | None = None) -> dict:
+    st = os.stat(path)
+    return {
+        "hash": file_hash(path, known),
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+    }
+
+
+def load_manifest(output_dir: str) -> dict:
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {"mesh": {}, "snapshots": {}}
+
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(output_dir: str, manifest: dict):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    tmp = f"{path}.tmp"
+
+    # write then rename so a killed run never leaves a truncated manifest
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def write_pvd(pvd_file: str, exports: list[tuple[float, str]]):
+    tmp = f"{pvd_file}.tmp"
+
+    with open(tmp, "w") as f:
+        f.write('<?xml version="1.0"?>\n')
+        f.write('<VTKFile type="Collection" version="0.1" byte_order="LittleEndian">\n')
+        f.write('  <Collection>\n')
+
+        for t, fname in exports:
+            f.write(f'    <DataSet timestep="{t}" group="" part="0" file="{fname}"/>\n')
+
+        f.write('  </Collection>\n')
+        f.write('</VTKFile>\n')
+
+    os.replace(tmp, pvd_file)
+
+
+def report_savings(manifest: dict):
+    timings = {"subprocess": [], "inprocess": []}
+    for entry in manifest["snapshots"].values():
+        if entry.get("engine") in timings and "elapsed" in entry:
+            timings[entry["engine"]].append(entry["elapsed"])
+
+    if not timings["subprocess"] or not timings["inprocess"]:
+        print("Not enough timings to compare the subprocess and in-process paths")
+        return
+
+    sub = sum(timings["subprocess"]) / len(timings["subprocess"])
+    inp = sum(timings["inprocess"]) / len(timings["inprocess"])
+    print(
+        f"Per file: subprocess {sub:.2f}s, in-process {inp:.2f}s, "
+        f"saving {sub - inp:.2f}s ({100 * (sub - inp) / sub:.0f}%)"
+    )
+
 
 def main():
     ap = argparse.ArgumentParser()
@@ -12,17 +573,42 @@ def main():
     ap.add_argument("-i", "--input", default="./", help="Input folder")
     ap.add_argument("-o", "--output", default="./", help="Output folder")
     ap.add_argument("-t", "--type", default=".vtu", help="Output extension")
-    ap.add_argument("pvd_name", type=str, help="Name of the PVD file")
+    ap.add_argument("-j", "--jobs", default=1, type=int, help="Number of concurrent exports")
+    ap.add_argument("-m", "--max-mem", default=None, type=parse_mem,
+                    help="Total memory budget for all exports, e.g. 200G")
+    ap.add_argument("-r", "--retries", default=1, type=int, help="Retries per failed snapshot")
+    ap.add_argument("-f", "--force", action="store_true",
+                    help="Re-export every snapshot, ignoring the manifest")
+    ap.add_argument("--in-process", action="store_true",
+                    help="Export through PyFR as a library, loading the mesh once")
+    ap.add_argument("-w", "--watch", action="store_true",
+                    help="Keep running and export snapshots as the solver writes them")
+    ap.add_argument("--settle", default=2.0, type=float,
+                    help="Seconds a snapshot must be left alone before it is exported in watch mode")
+    ap.add_argument("--idle-timeout", default=None, type=float,
+                    help="Stop watching after this many seconds without a new snapshot")
+    ap.add_argument("--format", default="pvd", choices=["pvd", "vtkhdf"],
+                    help="One file per snapshot plus a PVD, or a single VTKHDF series")
+    ap.add_argument("--compression", default=4, type=int, choices=range(10),
+                    help="gzip level for the VTKHDF datasets")
+    ap.add_argument("pvd_name", type=str, help="Name of the PVD (or VTKHDF) file")
 
     args = ap.parse_args()
 
+    if args.jobs < 1:
+        ap.error("--jobs must be at least 1")
+    if args.in_process and args.jobs > 1:
+        ap.error("--in-process exports serially, it cannot be combined with --jobs")
+    if args.format == "vtkhdf" and args.type != ".vtu":
+        ap.error("--format vtkhdf is built from .vtu exports, --type must be .vtu")
+
     # gather
     input_dir = args.input
     output_dir = args.output
-    
+
     # Get all .pyfrs files
     files = [f for f in os.listdir(input_dir) if f.endswith(".pyfrs")]
-    
+
     # Sort them by the numeric part of the filename (robust sorting)
     # Extracts the last floating point number found in the filename
     def extract_time(f):
@@ -31,54 +617,266 @@ def main():
 
     files.sort(key=extract_time)
 
-    if not files:
+    if not files and not args.watch:
         print("No .pyfrs files found!")
         return
 
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+    settings = {
+        "divisor": args.divisor,
+        "precision": args.precision,
+        "gradients": args.gradients,
+        "type": args.type,
+        "format": args.format,
+    }
+
+    print(f"Hashing mesh {args.mesh_file}...")
+    mesh = file_record(args.mesh_file, manifest["mesh"].get(args.mesh_file))
+    manifest["mesh"][args.mesh_file] = mesh
+
+    def is_current(fname, snapshot):
+        entry = manifest["snapshots"].get(fname)
+        return (
+            entry is not None
+            and entry["mesh_hash"] == mesh["hash"]
+            and entry["snapshot_hash"] == snapshot["hash"]
+            and all(entry.get(k) == v for k, v in settings.items())
+            and os.path.exists(os.path.join(output_dir, entry["output"]))
+        )
+
+    pvd_file = os.path.join(output_dir, args.pvd_name)
+    if not pvd_file.endswith(".pvd"):
+        pvd_file += ".pvd"
+
+    series = None
+    if args.format == "vtkhdf":
+        hdf_file = pvd_file.removesuffix(".pvd") + ".vtkhdf"
+        try:
+            series = VtkHdfSeries(hdf_file, mesh["hash"], settings, args.compression)
+        except ImportError:
+            ap.error("--format vtkhdf requires h5py")
+
+        if series.reset:
+            # its steps were for another mesh or other settings, so every
+            # snapshot the manifest had in it is exported again
+            print(f"Rebuilding {hdf_file} for the new mesh or settings")
+            for fname, entry in list(manifest["snapshots"].items()):
+                if entry["output"] == os.path.basename(hdf_file):
+                    del manifest["snapshots"][fname]
+
+        # individual snapshots only live here until they are in the series
+        staging_dir = os.path.join(output_dir, ".vtkhdf-staging")
+        os.makedirs(staging_dir, exist_ok=True)
+
+    snapshots = {}
+
+    def record_snapshot(fname):
+        known = manifest["snapshots"].get(fname, {})
+        known = {
+            "hash": known.get("snapshot_hash"),
+            "size": known.get("size"),
+            "mtime_ns": known.get("mtime_ns"),
+        }
+        snapshots[fname] = file_record(os.path.join(input_dir, fname), known)
+
+        # whether the snapshot needs exporting
+        return args.force or not is_current(fname, snapshots[fname])
+
+    pending = [fname for fname in files if record_snapshot(fname)]
+
     # export
-    print(f"Found {len(files)} files. Starting export...")
-    
-    valid_exports = []
+    print(
+        f"Found {len(files)} files, {len(files) - len(pending)} up to date. "
+        f"Exporting {len(pending)} with {args.jobs} job(s)..."
+    )
+
+    budget = MemoryBudget(args.max_mem)
+    print_lock = threading.Lock()
+
+    exporter = None
+    calibrate = None
+    if args.in_process and (pending or args.watch):
+        # per-file timings of earlier subprocess exports give us a baseline
+        # to compare against; without any, time the first snapshot that way
+        baseline = [
+            e["elapsed"] for e in manifest["snapshots"].values()
+            if e.get("engine") == "subprocess" and "elapsed" in e
+        ]
+        if not baseline and len(pending) > 1:
+            calibrate = pending[0]
+
+        tstart = time.perf_counter()
+        try:
+            exporter = InProcessExporter(
+                args.mesh_file, args.divisor, args.precision, args.gradients, args.type
+            )
+        except ImportError:
+            ap.error("--in-process requires PyFR to be importable from this interpreter")
+
+        print(f"Loaded mesh in-process in {time.perf_counter() - tstart:.2f}s")
+
+    def run_in_process(in_path, out_path):
+        try:
+            exporter.export(in_path, out_path)
+            returncode, stderr = 0, ""
+        except Exception:
+            returncode, stderr = 1, traceback.format_exc()
+
+        # all we can see from in here is the peak of the whole process
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        return returncode, peak_rss, stderr
+
+    def rebuild_pvd():
+        # rebuild the collection from everything the manifest knows to be
+        # current, in time order regardless of completion order
+        valid_exports = sorted(
+            (entry["time"], entry["output"])
+            for fname, entry in manifest["snapshots"].items()
+            if fname in snapshots and is_current(fname, snapshots[fname])
+        )
+        write_pvd(pvd_file, valid_exports)
 
-    for i, fname in enumerate(files):
+    def export(label, fname):
         in_path = os.path.join(input_dir, fname)
         out_name = fname.replace(".pyfrs", args.type)
         out_path = os.path.join(output_dir, out_name)
-        
+
+        if series:
+            out_path = os.path.join(staging_dir, out_name)
+
         # Build command
         cmd = ["pyfr", "export", "-d", str(args.divisor), "-p", args.precision]
         if args.gradients:
             cmd.append("-g")
         cmd.extend([args.mesh_file, in_path, out_path])
 
-        print(f"[{i+1}/{len(files)}] Exporting {fname} -> {out_name}...")
-        
-        # Run SERIALLY to save RAM/CPU
-        try:
-            subprocess.check_call(cmd)
-            valid_exports.append((extract_time(fname), out_name))
-        except subprocess.CalledProcessError:
-            print(f"Error exporting {fname}, skipping.")
+        for attempt in range(args.retries + 1):
+            reserved = budget.acquire()
+            with print_lock:
+                print(f"{label} Exporting {fname} -> {out_name}...")
 
-    # write out
-    pvd_file = os.path.join(output_dir, args.pvd_name)
-    if not pvd_file.endswith(".pvd"):
-        pvd_file += ".pvd"
+            engine = "inprocess" if exporter and fname != calibrate else "subprocess"
 
-    print(f"Writing PVD to {pvd_file}...")
+            tstart = time.perf_counter()
+            if engine == "inprocess":
+                returncode, peak_rss, stderr = run_in_process(in_path, out_path)
+            else:
+                returncode, peak_rss, stderr = run_export(cmd)
+            elapsed = time.perf_counter() - tstart
 
-    with open(pvd_file, "w") as f:
-        f.write('<?xml version="1.0"?>\n')
-        f.write('<VTKFile type="Collection" version="0.1" byte_order="LittleEndian">\n')
-        f.write('  <Collection>\n')
-        
-        for t, fname in valid_exports:
-            f.write(f'    <DataSet timestep="{t}" group="" part="0" file="{fname}"/>\n')
-            
-        f.write('  </Collection>\n')
-        f.write('</VTKFile>\n')
+            budget.release(reserved, peak_rss)
+
+            if returncode == 0 and series:
+                try:
+                    series.append(extract_time(fname), out_path)
+                    os.remove(out_path)
+                    out_name = os.path.basename(series.path)
+                except Exception:
+                    returncode, stderr = 1, traceback.format_exc()
+
+            if returncode == 0:
+                snapshot = snapshots[fname]
+
+                # record progress as we go so an interrupted run can resume
+                with print_lock:
+                    manifest["snapshots"][fname] = {
+                        "time": extract_time(fname),
+                        "output": out_name,
+                        "mesh_hash": mesh["hash"],
+                        "snapshot_hash": snapshot["hash"],
+                        "size": snapshot["size"],
+                        "mtime_ns": snapshot["mtime_ns"],
+                        "engine": engine,
+                        "elapsed": elapsed,
+                        **settings,
+                    }
+                    save_manifest(output_dir, manifest)
+
+                    # in watch mode this is what makes the new step visible
+                    if args.watch and not series:
+                        rebuild_pvd()
+
+                    print(
+                        f"{label} Done {fname} in {elapsed:.2f}s "
+                        f"(peak rss {format_mem(peak_rss)})"
+                    )
+                return
+
+            with print_lock:
+                print(f"Error exporting {fname} (exit code {returncode}, attempt {attempt + 1})")
+                if stderr:
+                    print(stderr.rstrip())
+
+        with print_lock:
+            print(f"Giving up on {fname}, skipping.")
+
+    labels = [f"[{i+1}/{len(pending)}]" for i in range(len(pending))]
+
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        if not args.watch:
+            list(pool.map(export, labels, pending))
+        else:
+            for label, fname in zip(labels, pending):
+                pool.submit(export, label, fname)
+
+            watch(args, pool, export, record_snapshot)
+
+    save_manifest(output_dir, manifest)
+
+    if exporter:
+        report_savings(manifest)
+
+    # write out
+    if series:
+        print(f"Wrote series to {series.path}")
+    else:
+        print(f"Writing PVD to {pvd_file}...")
+        rebuild_pvd()
 
     print("Done!")
 
+
+def watch(args, pool, export, record_snapshot):
+    watcher = SnapshotWatcher(args.input)
+    print(f"Watching {args.input} for new snapshots, press Ctrl-C to stop...")
+
+    # a file can be closed more than once while it is being written, so only
+    # export it once it has been left alone for --settle seconds
+    settling = {}
+    last_seen = time.monotonic()
+    count = 0
+
+    try:
+        while True:
+            timeout = args.settle if settling else args.idle_timeout
+            for fname in watcher.wait(timeout):
+                if fname.endswith(".pyfrs"):
+                    settling[fname] = time.monotonic()
+
+            now = time.monotonic()
+            for fname, tevent in list(settling.items()):
+                if now - tevent >= args.settle:
+                    del settling[fname]
+
+                    if not record_snapshot(fname):
+                        continue
+
+                    count += 1
+                    pool.submit(export, f"[watch {count}]", fname)
+                    last_seen = now
+
+            if (
+                args.idle_timeout is not None
+                and not settling
+                and now - last_seen >= args.idle_timeout
+            ):
+                print(f"No new snapshots for {args.idle_timeout}s, stopping")
+                break
+    except KeyboardInterrupt:
+        print("Stopping watch, waiting for running exports to finish...")
+    finally:
+        watcher.close()
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
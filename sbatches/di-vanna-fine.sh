@@ -6,6 +6,7 @@
 #SBATCH --mem=128G
 #SBATCH --gres=gpu:1
 #SBATCH --time=24:00:00
+#SBATCH --requeue
 #SBATCH --output=pyfr-inlet-%j.log
 #SBATCH --error=pyfr-inlet-%j.err
 #SBATCH --constraint=h100
@@ -15,5 +16,9 @@ source ~/pyfr/initenv.sh
 
 cd /scratch/users/k24108571/di-vanna/fine
 
-pyfr import fine.msh mesh.pyfrm
-mpiexec -n 1 pyfr run -b cuda mesh.pyfrm fine.ini
\ No newline at end of file
+# a fresh import gets a new uuid, which would orphan the checkpoints
+if [ ! -f mesh.pyfrm ] || [ fine.msh -nt mesh.pyfrm ]; then
+    pyfr import fine.msh mesh.pyfrm
+fi
+python ~/pyfr/cases/preflight.py mesh.pyfrm --ini fine.ini -g 1 -o preflight.json || exit 1
+python ~/pyfr/cases/restart.py --mesh mesh.pyfrm --ini fine.ini -n 1
\ No newline at end of file
@@ -6,6 +6,7 @@
 #SBATCH --mem=128G
 #SBATCH --gres=gpu:2
 #SBATCH --time=12:00:00
+#SBATCH --requeue
 #SBATCH --output=pyfr-mindrag-%j.log
 #SBATCH --error=pyfr-mindrag-%j.err
 #SBATCH --constraint=h100
@@ -21,15 +22,13 @@ for CASE_DIR in "${RUN_DIR}"/*/
 do
     cd "${CASE_DIR}"
 
-    rm -rf out 
-    rm -f forces.csv
-    mkdir out
-
     MESH=$(ls *.pyfrm | head -n 1)
     INI=$(ls *.ini | head -n 1)
 
-    pyfr partition add -f -p scotch -e pri:1 -e hex:1 "${MESH}" "${N}"
+    python ~/pyfr/cases/partcache.py "${MESH}" "${N}" -e pri:1 -e hex:1 \
+        --cache-dir "${RUN_DIR}/.partition-cache"
 
+    # carries on from the last checkpoint if the job was preempted
     echo "starting pyfr in ${CASE_DIR}"
-    mpiexec -n "${N}" pyfr run -b cuda "${MESH}" "${INI}"
+    python ~/pyfr/cases/restart.py --mesh "${MESH}" --ini "${INI}" -n "${N}"
 done
\ No newline at end of file